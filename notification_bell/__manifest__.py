@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Notification Bell',
-    'version': '1.0',
+    'version': '1.3',
     'category': 'Extra Tools',
     'summary': 'A bell icon notification system similar to social media platforms',
     'description': """
@@ -41,8 +41,14 @@ This module is licensed under LGPL-3.
     'data': [
         'security/notification_security.xml',
         'security/ir.model.access.csv',
+        'data/notification_cache_stamp.xml',
+        'data/ir_config_parameter.xml',
+        'data/ir_cron.xml',
         'views/notification_views.xml',
         'views/notification_settings_views.xml',
+        'views/notification_queue_views.xml',
+        'views/notification_template_views.xml',
+        'views/notification_broadcast_views.xml',
         'views/menuitem.xml',
     ],
     'assets': {
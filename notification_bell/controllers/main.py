@@ -4,12 +4,18 @@ This module defines the controllers for handling notification
 API requests from the frontend.
 """
 
+import csv
+import io
+import json
+
+from werkzeug.exceptions import BadRequest, Forbidden
+
 from odoo import http
-from odoo.http import request
-from odoo import fields
-import pytz
+from odoo.http import content_disposition, request
 from odoo import api
 
+from ..tools import metrics
+
 class NotificationController(http.Controller):
     """Controller handling notification API endpoints.
     
@@ -18,50 +24,43 @@ class NotificationController(http.Controller):
     """
     
     @http.route('/notification_bell/get_notifications', type='json', auth='user')
-    def get_notifications(self, limit=None):
+    def get_notifications(self, limit=None, cursor=None, search=None, etag=None):
         """Lấy danh sách thông báo gần đây của người dùng hiện tại.
         
         Args:
             limit (int, optional): Số lượng thông báo tối đa sẽ trả về. Mặc định: 10.
+            cursor (str, optional): Con trỏ ``next_cursor`` của trang trước.
+            search (str, optional): Từ khóa tìm kiếm trong tiêu đề và nội dung thông báo.
+            etag (str, optional): ``etag`` của lần trả về trước, hoặc header ``If-None-Match``.
             
         Returns:
-            dict: Danh sách thông báo và số lượng thông báo chưa đọc
+            dict: Danh sách thông báo, số lượng thông báo chưa đọc và con trỏ của trang tiếp theo,
+                hoặc ``not_modified`` nếu không có gì thay đổi
         """
-
-        if not limit:
-            settings = request.env['user.notification.settings'].get_user_settings(user_id=request.env.user.id)
-            limit = settings.notifications_limit
-        else:
-            settings = request.env['user.notification.settings'].get_user_settings(user_id=request.env.user.id)
-
-        Notification = request.env['user.notification']
-        domain = [('user_id', '=', request.env.user.id)]
-        notifications = Notification.search(domain, limit=limit, order='create_date desc')
-        unread_count = Notification.get_unread_count()
-        user_tz = request.env.user.tz or 'UTC'
-        user_tz_obj = pytz.timezone(user_tz)
-        
-        result = {
-            'notifications': [{
-                'id': n.id,
-                'name': n.name,
-                'message': n.message,
-                'create_date': fields.Datetime.context_timestamp(
-                    request.env.user, 
-                    n.create_date
-                ).astimezone(user_tz_obj).strftime('%Y-%m-%d %H:%M:%S') if n.create_date else False,
-                'state': n.state,
-                'type': n.notification_type,
-                'sender_name': n.sender_id.name,
-                'sender_id': n.sender_id.id,
-            } for n in notifications],
-            'unread_count': unread_count,
-            'settings': {
-                'notifications_limit': settings.notifications_limit,
-            },
-        }
+        return self._with_etag(request.env['user.notification'].json_rpc('/notification_bell/get_notifications', {
+            'limit': limit,
+            'cursor': cursor,
+            'search': search,
+            'etag': etag or self._get_if_none_match(),
+        }))
+    
+    @http.route('/notification_bell/sync', type='json', auth='user')
+    def sync(self, since_version=0, broadcast_stamp=None):
+        """Get the changes since the version the client last saw.
         
-        return result
+        Args:
+            since_version (int, optional): ``version`` of the last snapshot or sync
+            broadcast_stamp (str, optional): ``broadcast_stamp`` of the last snapshot or sync
+            
+        Returns:
+            dict: New version, unread count, new or changed notifications,
+                dismissed notification IDs and whether the client must
+                reload the whole list
+        """
+        return request.env['user.notification'].json_rpc('/notification_bell/sync', {
+            'since_version': since_version,
+            'broadcast_stamp': broadcast_stamp,
+        })
     
     @http.route('/notification_bell/mark_as_read', type='json', auth='user')
     def mark_as_read(self, notification_id=None, all_notifications=False):
@@ -77,27 +76,10 @@ class NotificationController(http.Controller):
         Returns:
             dict: Dictionary containing success status and unread count
         """
-        user_id = request.env.user.id
-        notifications = False
-        
-        if all_notifications:
-            notifications = request.env['user.notification'].search([
-                ('user_id', '=', user_id),
-                ('state', '=', 'unread')
-            ])
-        elif notification_id:
-            notifications = request.env['user.notification'].search([
-                ('id', '=', notification_id),
-                ('user_id', '=', user_id)
-            ])
-            
-        if notifications:
-            notifications.mark_as_read()
-            
-        return {
-            'success': True,
-            'unread_count': request.env['user.notification'].get_unread_count()
-        }
+        return request.env['user.notification'].json_rpc('/notification_bell/mark_as_read', {
+            'notification_id': notification_id,
+            'all_notifications': all_notifications,
+        })
     
     @http.route('/notification_bell/mark_as_unread', type='json', auth='user')
     def mark_as_unread(self, notification_id):
@@ -111,32 +93,51 @@ class NotificationController(http.Controller):
         Returns:
             dict: Dictionary containing success status and unread count
         """
-        user_id = request.env.user.id
-        notification = request.env['user.notification'].search([
-            ('id', '=', notification_id),
-            ('user_id', '=', user_id)
-        ], limit=1)
-        
-        if notification:
-            notification.mark_as_unread()
-            
-        return {
-            'success': True,
-            'unread_count': request.env['user.notification'].get_unread_count()
-        }
+        return request.env['user.notification'].json_rpc('/notification_bell/mark_as_unread', {
+            'notification_id': notification_id,
+        })
     
     @http.route('/notification_bell/get_unread_count', type='json', auth='user')
-    def get_unread_count(self):
+    def get_unread_count(self, etag=None):
         """Get unread notification count.
         
         Returns the count of unread notifications for the current user.
         
+        Args:
+            etag (str, optional): ``etag`` of the last response, defaults
+                to the ``If-None-Match`` header
+        
+        Returns:
+            dict: Dictionary containing unread count and ``etag``, or
+                ``not_modified`` when nothing changed
+        """
+        return self._with_etag(request.env['user.notification'].json_rpc('/notification_bell/get_unread_count', {
+            'etag': etag or self._get_if_none_match(),
+        }))
+    
+    def _get_if_none_match(self):
+        """Read the version tag sent in the ``If-None-Match`` header.
+        
         Returns:
-            dict: Dictionary containing unread count
+            str: Version tag, without quotes, or None
         """
-        return {
-            'unread_count': request.env['user.notification'].get_unread_count()
-        }
+        value = request.httprequest.headers.get('If-None-Match')
+        if not value:
+            return None
+        return value.strip().removeprefix('W/').strip('"')
+    
+    def _with_etag(self, result):
+        """Send the version tag of a result in the ``ETag`` header too.
+        
+        Args:
+            result (dict): Result of the route
+            
+        Returns:
+            dict: The result
+        """
+        if result.get('etag'):
+            request.future_response.headers['ETag'] = f'"{result["etag"]}"'
+        return result
     
     @http.route('/notification_bell/dismiss_notification', type='json', auth='user')
     def dismiss_notification(self, notification_id):
@@ -151,21 +152,121 @@ class NotificationController(http.Controller):
         Returns:
             dict: Dictionary containing success status and unread count
         """
-        user_id = request.env.user.id
-        notification = request.env['user.notification'].search([
-            ('id', '=', notification_id),
-            ('user_id', '=', user_id)
-        ], limit=1)
-        
-        success = False
-        if notification:
-            notification.dismiss_notification()
-            success = True
+        return request.env['user.notification'].json_rpc('/notification_bell/dismiss_notification', {
+            'notification_id': notification_id,
+        })
+    
+    @http.route('/notification_bell/batch', type='json', auth='user')
+    def batch(self, calls):
+        """Run several notification routes in one request and transaction.
+        
+        Args:
+            calls (list): ``{'route': ..., 'params': {...}}`` dictionaries
             
-        return {
-            'success': success,
-            'unread_count': request.env['user.notification'].get_unread_count()
-        }
+        Returns:
+            dict: Results of the calls, in order, and the unread count
+        """
+        return request.env['user.notification'].json_rpc('/notification_bell/batch', {'calls': calls})
+    
+    @http.route('/notification_bell/export', type='http', auth='user')
+    def export(self, export_format='csv', user_id=None, chunk_size=1000):
+        """Stream the whole notification history of a user.
+        
+        The file is written chunk by chunk while it is downloaded, so
+        memory stays flat however many notifications the user has. Each
+        chunk is read in its own short transaction, see ``_stream_export``.
+        
+        Args:
+            export_format (str, optional): ``csv`` or ``ndjson``
+            user_id (int, optional): User to export, only for managers.
+                Defaults to the current user.
+            chunk_size (int, optional): Number of notifications per chunk
+            
+        Returns:
+            Response: Streamed file
+        """
+        if export_format not in ('csv', 'ndjson'):
+            raise BadRequest("Unsupported export format.")
+        try:
+            user_id = int(user_id or request.env.uid)
+            chunk_size = max(1, min(int(chunk_size), 10000))
+        except ValueError:
+            raise BadRequest("user_id and chunk_size must be integers.")
+        if user_id != request.env.uid and not request.env.user.has_group(
+                'notification_bell.group_notification_manager'):
+            raise Forbidden()
+        stream = self._stream_export(
+            request.env.registry, request.env.uid, dict(request.env.context),
+            user_id, export_format, chunk_size,
+        )
+        filename = f'notifications-{user_id}.{export_format}'
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        return request.make_response(stream, headers=[
+            ('Content-Type', f'{content_type}; charset=utf-8'),
+            ('Content-Disposition', content_disposition(filename)),
+        ])
+    
+    def _stream_export(self, registry, uid, context, user_id, export_format, chunk_size):
+        """Generate the export file chunk by chunk.
+        
+        The generator runs while the response is sent, after the request's
+        transaction is over: every chunk opens a new cursor, reads the next
+        page of the keyset and closes it before the chunk is sent, so no
+        transaction stays open during the download.
+        
+        Args:
+            registry (Registry): Registry of the database
+            uid (int): ID of the user running the export
+            context (dict): Context of the request
+            user_id (int): ID of the user whose notifications are exported
+            export_format (str): ``csv`` or ``ndjson``
+            chunk_size (int): Number of notifications per chunk
+            
+        Yields:
+            bytes: Encoded chunk of the file
+        """
+        columns = [
+            'id', 'create_date', 'sender', 'type', 'title', 'message',
+            'state', 'read_date', 'dismissed', 'res_model', 'res_id',
+        ]
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(columns)
+            yield buffer.getvalue().encode()
+        for active in (True, False):
+            position = None
+            while True:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, context)
+                    rows, position = env['user.notification']._export_chunk(
+                        user_id, active, position, chunk_size)
+                if not rows:
+                    break
+                buffer = io.StringIO()
+                if export_format == 'csv':
+                    writer = csv.writer(buffer)
+                    writer.writerows([row[column] for column in columns] for row in rows)
+                else:
+                    buffer.writelines(json.dumps(row) + '\n' for row in rows)
+                yield buffer.getvalue().encode()
+                if len(rows) < chunk_size:
+                    break
+    
+    @http.route('/notification_bell/metrics', type='http', auth='user')
+    def export_metrics(self):
+        """Expose the metrics of the serving worker in the Prometheus text format.
+        
+        Only available to administrators. Each worker process keeps its
+        own metrics, distinguished by the ``worker`` label.
+        
+        Returns:
+            Response: Metrics as ``text/plain``
+        """
+        if not request.env.user.has_group('base.group_system'):
+            raise Forbidden()
+        return request.make_response(metrics.render(), headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+        ])
 
     @api.model
     def create_notification(self, values):
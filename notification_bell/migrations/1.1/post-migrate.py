@@ -0,0 +1,8 @@
+"""Fill the unread counters for notifications created before 1.1."""
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['user.notification.counter']._recompute_counters()
@@ -3,5 +3,12 @@
 This package contains models for the notification_bell module.
 """
 
+from . import notification_cache_stamp
 from . import notification
-from . import user_settings 
\ No newline at end of file
+from . import user_settings
+from . import notification_counter
+from . import notification_queue
+from . import notification_template
+from . import notification_rate_bucket
+from . import notification_mute
+from . import notification_broadcast
\ No newline at end of file
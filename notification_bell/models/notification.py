@@ -4,9 +4,25 @@ This module defines the User Notification model which handles
 notification functionality similar to social media platforms.
 """
 
-from odoo import api, fields, models, _
-import json
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import AccessError, UserError
+from odoo.tools import SQL, create_index, split_every
+from collections import Counter, defaultdict
+from itertools import groupby
+from datetime import datetime, timedelta
+import base64
 import json
+import logging
+import psycopg2
+import pytz
+import re
+import threading
+import time
+import zlib
+
+from ..tools import metrics
+
+_logger = logging.getLogger(__name__)
 
 
 class UserNotification(models.Model):
@@ -19,10 +35,24 @@ class UserNotification(models.Model):
     
     _name = 'user.notification'
     _description = 'User Notification'
-    _order = 'create_date desc'
+    _order = 'create_date desc, id desc'
+    _bulk_batch_size = 5000
+    _collapse_window = 600
+    # Routes served by json_rpc: route -> (method, whether the unread count
+    # is added to the result). Built once, when the module is loaded.
+    _json_rpc_routes = {
+        '/notification_bell/get_notifications': ('get_bell_snapshot', False),
+        '/notification_bell/sync': ('get_changes', False),
+        '/notification_bell/get_unread_count': ('_rpc_get_unread_count', True),
+        '/notification_bell/mark_as_read': ('_rpc_mark_as_read', True),
+        '/notification_bell/mark_as_unread': ('_rpc_mark_as_unread', True),
+        '/notification_bell/dismiss_notification': ('_rpc_dismiss_notification', True),
+        '/notification_bell/open_notification': ('_rpc_open_notification', True),
+        '/notification_bell/batch': ('json_rpc_batch', False),
+    }
 
-    name = fields.Char(string='Title', required=True)
-    message = fields.Text(string='Message', required=True)
+    name = fields.Char(string='Title')
+    message = fields.Text(string='Message')
     user_id = fields.Many2one(
         'res.users', 
         string='To User', 
@@ -77,83 +107,968 @@ class UserNotification(models.Model):
         string='Type', 
         default='info'
     )
+    sync_version = fields.Integer(
+        string='Sync Version',
+        readonly=True,
+        copy=False,
+        help='Version of the recipient\'s counter when this notification was '
+             'created or last changed state. Used by the delta sync.'
+    )
+    template_id = fields.Many2one(
+        'user.notification.template',
+        string='Template',
+        ondelete='restrict',
+        help='When set, the title and message are rendered from the template'
+    )
+    template_params = fields.Text(
+        string='Template Parameters',
+        help='JSON encoded values of the template placeholders'
+    )
+    collapse_key = fields.Char(
+        string='Collapse Key',
+        copy=False,
+        help='Unread notifications of a user sharing this key are merged into one. '
+             'Cleared once the notification is read or dismissed.'
+    )
+    digest_period = fields.Selection(
+        [
+            ('hourly', 'Hourly'),
+            ('daily', 'Daily')
+        ],
+        string='Pending Digest',
+        copy=False,
+        readonly=True,
+        help='Set when the recipient receives this kind of notification as a '
+             'digest: no bus message is sent and the notification is announced '
+             'by the next digest of that period.'
+    )
+    content_search = fields.Char(
+        string='Content',
+        compute='_compute_content_search',
+        search='_search_content_search',
+        help='Full-text search over the title and the message'
+    )
+    occurrence_count = fields.Integer(
+        string='Occurrences',
+        default=1,
+        readonly=True,
+        copy=False,
+        help='Number of notifications merged into this one through its collapse key'
+    )
+
+    _sql_constraints = [
+        ('content_required',
+         'CHECK(template_id IS NOT NULL OR (name IS NOT NULL AND message IS NOT NULL))',
+         'A notification needs either a template or a title and a message!')
+    ]
+
+    def init(self):
+        """Create the indexes matching the bell's queries.
+        
+        Lists filter on ``user_id`` and ``active`` and sort on ``_order``,
+        unread lookups only ever touch unread, active rows and the delta
+        sync reads rows by ``(user_id, sync_version)``. The unique index on
+        ``(user_id, collapse_key)`` is the conflict target of collapsed
+        notifications, see ``_create_collapsed``. The retention purge walks
+        expired read and dismissed rows through two partial indexes, see
+        ``_cron_purge_expired``. ``init`` runs on install and on every
+        module update, so existing databases get the indexes when the
+        module is upgraded.
+        """
+        create_index(
+            self.env.cr,
+            'user_notification_user_active_date_idx',
+            self._table,
+            ['user_id', 'active', 'create_date DESC', 'id DESC'],
+        )
+        create_index(
+            self.env.cr,
+            'user_notification_user_unread_idx',
+            self._table,
+            ['user_id', 'create_date DESC', 'id DESC'],
+            where="state = 'unread' AND active",
+        )
+        create_index(
+            self.env.cr,
+            'user_notification_user_sync_version_idx',
+            self._table,
+            ['user_id', 'sync_version'],
+        )
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS user_notification_user_collapse_key_uniq
+                ON user_notification (user_id, collapse_key)
+             WHERE state = 'unread' AND active AND collapse_key IS NOT NULL
+        """)
+        create_index(
+            self.env.cr,
+            'user_notification_digest_period_idx',
+            self._table,
+            ['digest_period', 'user_id'],
+            where='digest_period IS NOT NULL',
+        )
+        create_index(
+            self.env.cr,
+            'user_notification_read_expiry_idx',
+            self._table,
+            ['(COALESCE(read_date, create_date))'],
+            where="state = 'read' AND active",
+        )
+        create_index(
+            self.env.cr,
+            'user_notification_dismissed_expiry_idx',
+            self._table,
+            ['write_date'],
+            where='NOT active',
+        )
+        self._init_search_vector()
+    
+    def _init_search_vector(self):
+        """Create the full-text search column and its index.
+        
+        ``search_vector`` is a generated column, so PostgreSQL keeps it up
+        to date on every insert and update of ``name`` and ``message``.
+        Notifications rendered from a template store neither and are not
+        searchable. With the ``btree_gin`` extension the GIN index also
+        covers ``user_id``, so a user's search is filtered inside the index
+        lookup; without it, the index only covers the vector.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            ALTER TABLE user_notification
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(message, ''))
+            ) STORED
+        """)
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+            expressions = ['user_id', 'search_vector']
+        except psycopg2.Error:
+            _logger.info("Extension btree_gin is not available, "
+                         "notification search will not be filtered by user in the index")
+            expressions = ['search_vector']
+        create_index(
+            cr,
+            'user_notification_search_vector_idx',
+            self._table,
+            expressions,
+            method='gin',
+        )
+
+    def _compute_content_search(self):
+        self.content_search = False
+    
+    def _search_content_search(self, operator, value):
+        """Search notifications with the full-text index.
+        
+        Every word of ``value`` must appear in the title or the message,
+        as a word or a word prefix.
+        """
+        if operator not in ('ilike', 'like', '=') or not isinstance(value, str):
+            raise UserError(_("Unsupported search on notification content."))
+        tsquery = self._get_tsquery(value)
+        if tsquery is None:
+            return []
+        query = self.with_context(active_test=False)._search([])
+        query.add_where(SQL('%s @@ %s', SQL.identifier(self._table, 'search_vector'), tsquery))
+        return [('id', 'in', query)]
+    
+    @api.model
+    def _get_tsquery(self, text):
+        """Build a prefix matching full-text query from user input.
+        
+        Args:
+            text (str): Words typed by the user
+            
+        Returns:
+            SQL: ``tsquery`` expression, or None if there is no word
+        """
+        words = re.findall(r'\w+', text or '')
+        if not words:
+            return None
+        return SQL("to_tsquery('simple', %s)", ' & '.join(f'{word}:*' for word in words))
+    
+    @api.depends('name', 'template_id', 'template_params')
+    def _compute_display_name(self):
+        for notification in self:
+            notification.display_name = self._render_content(
+                notification.template_id.id, notification.template_params,
+                notification.name, notification.message)[0]
 
     def mark_as_read(self):
         """Mark notification as read.
         
         Updates the state to 'read' and sets the read_date
-        to the current datetime.
+        to the current datetime, with a single UPDATE for the
+        whole recordset.
         
         Returns:
             bool: True indicating success
         """
-        for notification in self:
-            if notification.state == 'unread':
-                notification.write({
-                    'state': 'read',
-                    'read_date': fields.Datetime.now()
-                })
+        self._mark_as_read(self._where_ids())
         return True
     
     def mark_as_unread(self):
         """Mark notification as unread.
         
-        Updates the state to 'unread' and clears the read_date.
+        Updates the state to 'unread' and clears the read_date,
+        with a single UPDATE for the whole recordset.
         
         Returns:
             bool: True indicating success
         """
-        for notification in self:
-            if notification.state == 'read':
-                notification.write({
-                    'state': 'unread',
-                    'read_date': False
-                })
+        self._mark_as_unread(self._where_ids())
         return True
     
+    @api.model
+    def mark_as_read_domain(self, domain):
+        """Mark every notification matching a domain as read.
+        
+        Example: ``mark_as_read_domain([('res_model', '=', 'purchase.order')])``
+        
+        Args:
+            domain (list): Domain on ``user.notification``
+            
+        Returns:
+            list: IDs of the notifications that were marked as read
+        """
+        return self._mark_as_read(self._where_domain(domain))
+    
+    @api.model
+    def mark_as_unread_domain(self, domain):
+        """Mark every notification matching a domain as unread.
+        
+        Args:
+            domain (list): Domain on ``user.notification``
+            
+        Returns:
+            list: IDs of the notifications that were marked as unread
+        """
+        return self._mark_as_unread(self._where_domain(domain))
+    
+    @api.model
+    def dismiss_domain(self, domain):
+        """Dismiss every notification matching a domain.
+        
+        Example: ``dismiss_domain([('create_date', '<', fields.Datetime.subtract(fields.Datetime.now(), days=30))])``
+        
+        Args:
+            domain (list): Domain on ``user.notification``
+            
+        Returns:
+            list: IDs of the notifications that were dismissed
+        """
+        return self._dismiss(self._where_domain(domain))
+    
+    def _where_ids(self):
+        """Build the SQL condition selecting the records of ``self``.
+        
+        Returns:
+            SQL: Condition on the notification table
+        """
+        return self.with_context(active_test=False)._where_domain([('id', 'in', self.ids)])
+    
+    @api.model
+    def _where_domain(self, domain):
+        """Build the SQL condition selecting the notifications of a domain.
+        
+        Record rules are applied through ``_search``, so records the user
+        cannot access are left out of the UPDATE.
+        
+        Args:
+            domain (list): Domain on ``user.notification``
+            
+        Returns:
+            SQL: Condition on the notification table
+        """
+        self.browse().check_access('write')
+        return SQL('id IN %s', self._search(domain).subselect())
+    
+    def _mark_as_read(self, where, returning=None):
+        """Mark the unread notifications matching ``where`` as read."""
+        return self._update_rows(
+            SQL("state = 'unread' AND %s", where),
+            SQL("state = 'read', read_date = %s, collapse_key = NULL", self.env.cr.now()),
+            counted=SQL('active'),
+            sign=-1,
+            returning=returning,
+        )
+    
+    def _mark_as_unread(self, where):
+        """Mark the read notifications matching ``where`` as unread."""
+        return self._update_rows(
+            SQL("state = 'read' AND %s", where),
+            SQL("state = 'unread', read_date = NULL"),
+            counted=SQL('active'),
+            sign=1,
+        )
+    
+    def _dismiss(self, where):
+        """Dismiss the active notifications matching ``where``."""
+        return self._update_rows(
+            SQL('active AND %s', where),
+            SQL('active = FALSE, collapse_key = NULL'),
+            counted=SQL("state = 'unread'"),
+            sign=-1,
+        )
+    
+    @api.model
+    def _update_rows(self, where, assignments, counted, sign, returning=None):
+        """Update the notifications matching a condition in one statement.
+        
+        The matching rows are locked, the counters of their recipients are
+        adjusted (each row for which ``counted`` holds moves the unread count
+        of its recipient by ``sign``) and bumped to a new version, and the
+        rows are updated with that version, all in a single statement.
+        
+        Args:
+            where (SQL): Condition selecting the rows to update
+            assignments (SQL): SET clause of the update
+            counted (SQL): Whether a row changes the unread count, evaluated
+                on columns the update does not modify
+            sign (int): Counter change for each counted row, 1 or -1
+            returning (list, optional): Columns to return for each updated row
+            
+        Returns:
+            list: IDs of the updated notifications, or row dictionaries with
+                ``id``, ``user_id`` and the ``returning`` columns
+        """
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            """
+            WITH target AS (
+                SELECT id, user_id, %(counted)s AS counted
+                  FROM user_notification
+                 WHERE %(where)s
+              ORDER BY id
+                   FOR UPDATE
+            ), counter AS (
+                INSERT INTO user_notification_counter (user_id, unread_count, version)
+                SELECT user_id, %(sign)s * count(*) FILTER (WHERE counted), 1
+                  FROM target
+              GROUP BY user_id
+              ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE
+                SET unread_count = GREATEST(
+                        user_notification_counter.unread_count + EXCLUDED.unread_count, 0),
+                    version = user_notification_counter.version + 1
+             RETURNING user_id, version
+            )
+            UPDATE user_notification
+               SET %(assignments)s,
+                   sync_version = counter.version,
+                   write_uid = %(uid)s,
+                   write_date = %(now)s
+              FROM target
+              JOIN counter ON counter.user_id = target.user_id
+             WHERE user_notification.id = target.id
+         RETURNING %(returning)s
+            """,
+            counted=counted,
+            where=where,
+            sign=sign,
+            assignments=assignments,
+            uid=self.env.uid,
+            now=self.env.cr.now(),
+            returning=SQL(', ').join(
+                SQL.identifier(self._table, fname) for fname in ['id', 'user_id'] + (returning or [])
+            ),
+        ))
+        rows = self.env.cr.dictfetchall()
+        self._queue_bus_changes({row['user_id'] for row in rows})
+        result = rows if returning else [row['id'] for row in rows]
+        self.invalidate_model([
+            'state', 'read_date', 'active', 'collapse_key', 'sync_version', 'write_uid', 'write_date',
+        ])
+        self.env['user.notification.counter'].invalidate_model(['unread_count', 'version'])
+        return result
+    
     @api.model_create_multi
     def create(self, vals_list):
         """Override create to send notification to the user.
         
+        Muted notifications are dropped first, then the ones over the rate
+        limits are handled, see ``_apply_mute_rules`` and
+        ``_apply_rate_limits``; they are left out of the returned records.
+        Values with a ``collapse_key`` are handed over to
+        ``_create_collapsed``.
+        
         Args:
             vals_list (list): List of dictionaries with values for creating notifications
             
         Returns:
             UserNotification: Created notification records
         """
-        records = super(UserNotification, self).create(vals_list)
-        for record in records:
-            self._notify_user(record)
+        vals_list = self._apply_mute_rules(vals_list)
+        vals_list = self._apply_digest_periods(self._apply_rate_limits(vals_list))
+        if any(vals.get('collapse_key') for vals in vals_list):
+            ids = []
+            for collapsed, group in groupby(vals_list, key=lambda vals: bool(vals.get('collapse_key'))):
+                group = list(group)
+                records = self._create_collapsed(group) if collapsed else self._create_notifications(group)
+                ids += records.ids
+            return self.browse(ids)
+        return self._create_notifications(vals_list)
+    
+    @api.model
+    def _create_notifications(self, vals_list):
+        """Create notifications through the ORM and queue their bus messages.
+        
+        The counters of the recipients are updated first, so that the new
+        notifications are stamped with the resulting versions.
+        
+        Args:
+            vals_list (list): Values of the notifications
+            
+        Returns:
+            UserNotification: Created notification records
+        """
+        if not vals_list:
+            return self.browse()
+        defaults = self.default_get(['user_id', 'state', 'active'])
+        values_list = [dict(defaults, **vals) for vals in vals_list]
+        deltas = Counter()
+        for values in values_list:
+            deltas[values.get('user_id')] += values.get('state') == 'unread' and bool(values.get('active'))
+        versions = self.env['user.notification.counter']._apply_deltas(deltas)
+        
+        records = super(UserNotification, self).create([
+            dict(vals, sync_version=versions.get(values.get('user_id'), 0))
+            for vals, values in zip(vals_list, values_list)
+        ])
+        records._notify_users()
+        return records
+
+    @api.model
+    def _check_create_rules(self, vals_list):
+        """Check that the current user may create notifications with these values.
+
+        ``check_access('create')`` on an empty recordset only checks the
+        access rights of the model. The paths that do not create the rows
+        through the ORM right away, such as the queue, also need the
+        record rules, which are evaluated here on the values in memory.
+
+        Args:
+            vals_list (list): Values of the notifications to create
+        """
+        self.browse().check_access('create')
+        if self.env.su or not vals_list:
+            return
+        domain = self.env['ir.rule']._compute_domain(self._name, 'create')
+        if not domain:
+            return
+        records = self.browse().concat(*(
+            self.new({
+                fname: value
+                for fname, value in self._add_missing_default_values(vals).items()
+                if fname in self._fields and fname != 'id'
+            })
+            for vals in vals_list
+        ))
+        if len(records.filtered_domain(domain)) != len(records):
+            raise AccessError(_("You are not allowed to send notifications to these users."))
+
+    @api.model
+    def _apply_mute_rules(self, vals_list):
+        """Drop the notifications muted by their recipient.
+        
+        Relies on the cached index of mute rules, so this costs no query.
+        
+        Args:
+            vals_list (list): Values of the notifications to create
+            
+        Returns:
+            list: Values of the notifications that are not muted
+        """
+        index = self.env['user.notification.mute']._get_mute_index()
+        if not index:
+            return vals_list
+        return [
+            vals for vals in vals_list
+            if not self._is_muted_for(index, vals.get('user_id') or self.env.uid, vals)
+        ]
+    
+    @api.model
+    def _is_muted_for(self, index, user_id, vals):
+        """Check whether a recipient muted a notification.
+        
+        Args:
+            index (dict): Result of ``_get_mute_index``
+            user_id (int): ID of the recipient
+            vals (dict): Values of the notification
+            
+        Returns:
+            bool: Whether the notification is muted
+        """
+        rules = index.get(user_id)
+        return bool(rules) and self.env['user.notification.mute']._is_muted(
+            rules,
+            vals.get('sender_id') or self.env.uid,
+            vals.get('res_model') or None,
+            vals.get('notification_type') or 'info',
+        )
+    
+    @api.model
+    def _apply_digest_periods(self, vals_list):
+        """Set the digest period of notifications sent to digest users.
+        
+        Relies on the cached map of digest users, so this costs no query.
+        Values that already contain ``digest_period`` are left untouched.
+        
+        Args:
+            vals_list (list): Values of the notifications to create
+            
+        Returns:
+            list: Values of the notifications, with their digest period
+        """
+        periods = self.env['user.notification.settings']._get_digest_periods()
+        if not periods:
+            return vals_list
+        result = []
+        for vals in vals_list:
+            user_periods = periods.get(vals.get('user_id') or self.env.uid)
+            if user_periods and 'digest_period' not in vals:
+                vals = dict(vals, digest_period=user_periods.get(vals.get('notification_type') or 'info'))
+            result.append(vals)
+        return result
+    
+    @api.model
+    def _get_rate_limits(self):
+        """Read the rate limits from the system parameters.
+        
+        ``notification_bell.recipient_rate_limit`` and
+        ``notification_bell.sender_rate_limit`` are numbers of notifications
+        per minute, 0 disabling the limit. The matching ``_rate_burst``
+        parameters are the number of notifications that can be sent at
+        once, and default to the limit itself. System parameters are
+        cached, so this does not query the database.
+        
+        Returns:
+            dict: ``(capacity, tokens per second)`` per kind of bucket
+                (``recipient``, ``sender``), only for enabled limits
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        limits = {}
+        for kind in ('recipient', 'sender'):
+            limit = float(ICP.get_param(f'notification_bell.{kind}_rate_limit', 0) or 0)
+            if limit > 0:
+                burst = float(ICP.get_param(f'notification_bell.{kind}_rate_burst', 0) or 0)
+                limits[kind] = (burst or limit, limit / 60)
+        return limits
+    
+    @api.model
+    def _apply_rate_limits(self, vals_list):
+        """Filter out notifications exceeding the rate limits.
+        
+        Each recipient and each sender has a token bucket, shared by all
+        the workers through ``user.notification.rate.bucket``. The buckets
+        of a whole batch are checked with a single statement, and nothing
+        is queried when no limit is set. A notification goes through when
+        both its recipient and its sender still have tokens. The others are
+        handled according to ``notification_bell.rate_limit_policy``:
+        
+        - ``drop``: they are discarded and a warning is logged
+        - ``defer``: they are queued and delivered a minute later, when
+          the buckets have been refilled
+        - ``summarize`` (default): each recipient gets a single collapsed
+          notification telling how many notifications were held back
+        
+        The record rules are checked first, so that no policy creates or
+        queues notifications the current user could not create.
+        
+        Args:
+            vals_list (list): Values of the notifications to create
+            
+        Returns:
+            list: Values of the notifications allowed right now
+        """
+        limits = self._get_rate_limits()
+        if not limits or not vals_list:
+            return vals_list
+        self._check_create_rules(vals_list)
+        keys_list = [
+            [f'{kind}:{vals.get(field) or self.env.uid}'
+             for kind, field in (('recipient', 'user_id'), ('sender', 'sender_id'))
+             if kind in limits]
+            for vals in vals_list
+        ]
+        requested = Counter(key for keys in keys_list for key in keys)
+        granted = self.env['user.notification.rate.bucket']._consume({
+            key: (count, *limits[key.split(':')[0]]) for key, count in requested.items()
+        })
+        allowed, limited = [], []
+        for vals, keys in zip(vals_list, keys_list):
+            if all(granted.get(key, 0) > 0 for key in keys):
+                for key in keys:
+                    granted[key] -= 1
+                allowed.append(vals)
+            else:
+                limited.append(vals)
+        if limited:
+            self._handle_rate_limited(limited)
+        return allowed
+    
+    @api.model
+    def _handle_rate_limited(self, vals_list):
+        """Apply the rate limit policy to notifications over the limits.
+        
+        With the ``summarize`` policy, the summary of a recipient stays a
+        single unread notification: its ``occurrence_count`` is the total
+        of the notifications held back while it was unread and within the
+        collapse window, and its message is refreshed with that total.
+        
+        Args:
+            vals_list (list): Values of the notifications that were held back
+        """
+        policy = self.env['ir.config_parameter'].sudo().get_param(
+            'notification_bell.rate_limit_policy', 'summarize')
+        if policy == 'defer':
+            self.env['user.notification.queue'].enqueue(vals_list, priority='2', delay=60)
+            return
+        if policy == 'drop':
+            _logger.warning("Rate limit exceeded: %s notifications dropped", len(vals_list))
+            return
+        held = Counter(vals.get('user_id') or self.env.uid for vals in vals_list)
+        collapse_key = 'notification_bell.rate_limited'
+        self.flush_model(['user_id', 'collapse_key', 'state', 'active', 'create_date', 'occurrence_count'])
+        self.env.cr.execute("""
+            SELECT user_id, occurrence_count
+              FROM user_notification
+             WHERE user_id IN %s AND collapse_key = %s AND state = 'unread' AND active
+               AND create_date > %s
+        """, [
+            tuple(held), collapse_key,
+            fields.Datetime.now() - timedelta(seconds=self._collapse_window),
+        ])
+        previous = dict(self.env.cr.fetchall())
+        self.sudo()._create_collapsed([{
+            'user_id': user_id,
+            'sender_id': self.env.uid,
+            'name': _("Too many notifications"),
+            'message': _("%(count)s notifications for you were held back because too many "
+                         "notifications were sent in a short time.",
+                         count=previous.get(user_id, 0) + count),
+            'notification_type': 'warning',
+            'collapse_key': collapse_key,
+            'occurrence_count': count,
+        } for user_id, count in held.items()])
+    
+    def write(self, vals):
+        """Override write to keep the unread counters up to date.
+        
+        Args:
+            vals (dict): Values to write
+            
+        Returns:
+            bool: True indicating success
+        """
+        if not {'state', 'active', 'user_id'} & set(vals):
+            return super(UserNotification, self).write(vals)
+        if vals.get('state') == 'read' or ('active' in vals and not vals['active']):
+            vals = dict(vals, collapse_key=False)
+        before = self._count_unread_by_user()
+        result = super(UserNotification, self).write(vals)
+        after = self._count_unread_by_user()
+        after.subtract(before)
+        self._stamp_versions(self.env['user.notification.counter']._apply_deltas(after))
+        self._queue_bus_changes(after)
+        return result
+    
+    @api.model
+    def _create_collapsed(self, vals_list):
+        """Create notifications, merging them into matching unread ones.
+        
+        Each notification is written with one ``INSERT ... ON CONFLICT``
+        statement on the ``(user_id, collapse_key)`` unique index. When
+        the recipient already has an unread notification with the same key
+        that was created less than ``collapse_window`` seconds ago, that
+        notification gets the new content, a fresh date and its
+        ``occurrence_count`` increased instead of a new row being inserted.
+        A matching notification outside the window loses its key and a new
+        notification is inserted.
+        
+        Args:
+            vals_list (list): Values of the notifications, each with a
+                ``collapse_key``, an optional ``collapse_window`` and an
+                optional ``occurrence_count``, the number of occurrences
+                the notification stands for (1 by default)
+            
+        Returns:
+            UserNotification: Created or updated notification records
+        """
+        self.browse().check_access('create')
+        NotificationCounter = self.env['user.notification.counter']
+        now = fields.Datetime.now()
+        ids = []
+        for vals in vals_list:
+            vals = dict(vals)
+            window = vals.pop('collapse_window', None) or self._collapse_window
+            for fname in ('id', 'sync_version'):
+                vals.pop(fname, None)
+            vals = self._add_missing_default_values(vals)
+            vals.update({
+                'create_uid': self.env.uid,
+                'create_date': now,
+                'write_uid': self.env.uid,
+                'write_date': now,
+            })
+            user_id = vals['user_id']
+            # Lock the recipient's counter first: concurrent sends to the same
+            # user are serialized and the row gets the version of this change.
+            vals['sync_version'] = NotificationCounter._apply_deltas({user_id: 0})[user_id]
+            
+            columns, values = [], []
+            for fname, value in vals.items():
+                field = self._fields[fname]
+                if field.store and field.column_type:
+                    columns.append(fname)
+                    values.append(field.convert_to_column(value, self))
+            row = self._upsert_collapsed(columns, values, window)
+            if row is None:
+                self.env.cr.execute("""
+                    UPDATE user_notification
+                       SET collapse_key = NULL
+                     WHERE user_id = %s AND collapse_key = %s AND state = 'unread' AND active
+                """, [user_id, vals['collapse_key']])
+                row = self._upsert_collapsed(columns, values, window)
+            notification_id, inserted = row
+            if inserted and vals['state'] == 'unread' and vals['active']:
+                NotificationCounter._adjust_unread({user_id: 1})
+            ids.append(notification_id)
+        
+        self.invalidate_model()
+        records = self.browse(ids)
+        records.check_access('create')
+        records._notify_users()
         return records
     
-    def _notify_user(self, notification):
-        """Send notification through the bus.
+    @api.model
+    def _upsert_collapsed(self, columns, values, window):
+        """Insert a notification or merge it into its unread duplicate.
+        
+        Args:
+            columns (list): Names of the columns to insert
+            values (list): Column values
+            window (int): Maximum age in seconds of the notification to merge into
+            
+        Returns:
+            tuple: ID of the notification and whether it was inserted, or
+                None when a duplicate exists outside of the window
+        """
+        refreshed = [
+            fname for fname in (
+                'name', 'message', 'template_id', 'template_params', 'sender_id',
+                'notification_type', 'sync_version', 'create_date', 'write_uid', 'write_date',
+            )
+            if fname in columns
+        ]
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO user_notification (%(columns)s) VALUES %(values)s
+            ON CONFLICT (user_id, collapse_key)
+               WHERE state = 'unread' AND active AND collapse_key IS NOT NULL
+            DO UPDATE SET occurrence_count = user_notification.occurrence_count + EXCLUDED.occurrence_count,
+                          %(refreshed)s
+               WHERE user_notification.create_date > EXCLUDED.create_date - %(window)s * INTERVAL '1 second'
+            RETURNING id, xmax = 0
+            """,
+            columns=SQL(', ').join(SQL.identifier(fname) for fname in columns),
+            values=tuple(values),
+            refreshed=SQL(', ').join(
+                SQL('%s = EXCLUDED.%s', SQL.identifier(fname), SQL.identifier(fname))
+                for fname in refreshed
+            ),
+            window=window,
+        ))
+        return self.env.cr.fetchone()
+    
+    def unlink(self):
+        """Override unlink to keep the unread counters up to date.
         
-        Prepares notification data and sends it to the user's
-        notification channel.
+        Returns:
+            bool: True indicating success
+        """
+        unread = self._count_unread_by_user()
+        result = super(UserNotification, self).unlink()
+        self.env['user.notification.counter']._apply_deltas(
+            {user_id: -count for user_id, count in unread.items()})
+        self._queue_bus_changes(unread)
+        return result
+    
+    def _count_unread_by_user(self):
+        """Count the unread, active notifications of ``self`` per recipient.
+        
+        Returns:
+            Counter: Mapping of user ID to number of unread notifications,
+                with an entry for every recipient of ``self``
+        """
+        counts = Counter(dict.fromkeys(self.user_id.ids, 0))
+        counts.update(
+            notification.user_id.id
+            for notification in self
+            if notification.state == 'unread' and notification.active
+        )
+        return counts
+    
+    def _stamp_versions(self, versions):
+        """Store the new version of their recipient on the records of ``self``.
         
         Args:
-            notification (UserNotification): The notification to send
+            versions (dict): Mapping of user ID to its new version
         """
-        notification_data = {
-            'id': notification.id,
-            'name': notification.name,
-            'message': notification.message,
-            'type': notification.notification_type,
-            'action_type': notification.action_type,
-            'res_model': notification.res_model,
-            'res_id': notification.res_id,
-            'create_date': fields.Datetime.to_string(notification.create_date),
-            'sender_name': notification.sender_id.name,
+        if not self or not versions:
+            return
+        self.flush_recordset()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE user_notification
+               SET sync_version = version.version
+              FROM (VALUES %s) AS version(user_id, version)
+             WHERE user_notification.user_id = version.user_id
+               AND user_notification.id IN %s
+            """,
+            SQL(', ').join(SQL('(%s, %s)', user_id, version) for user_id, version in versions.items()),
+            self._ids,
+        ))
+        self.invalidate_recordset(['sync_version'])
+    
+    def _notify_users(self):
+        """Queue bus messages for the notifications in ``self``.
+        
+        Sender names are read for the whole recordset at once and the
+        payloads are handed to ``_queue_bus_payloads``, which delivers
+        them when the transaction commits. Notifications waiting for a
+        digest are not pushed.
+        """
+        realtime = self.filtered(lambda notification: not notification.digest_period)
+        sender_names = {sender.id: sender.name for sender in realtime.sender_id}
+        contents = {
+            notification.id: self._render_content(
+                notification.template_id.id, notification.template_params,
+                notification.name, notification.message)
+            for notification in realtime
         }
+        self._queue_bus_payloads([
+            (notification.user_id.id, {
+                'id': notification.id,
+                'name': contents[notification.id][0],
+                'message': contents[notification.id][1],
+                'type': notification.notification_type,
+                'action_type': notification.action_type,
+                'res_model': notification.res_model,
+                'res_id': notification.res_id,
+                'create_date': fields.Datetime.to_string(notification.create_date),
+                'sender_name': sender_names.get(notification.sender_id.id),
+                'occurrence_count': notification.occurrence_count,
+            })
+            for notification in realtime
+        ])
+    
+    @api.model
+    def _queue_bus_payloads(self, payloads):
+        """Collect notification payloads until the end of the transaction.
+        
+        Payloads are grouped per recipient and sent by
+        ``_flush_bus_payloads`` as one ``new_notification`` message per
+        channel, right before the transaction commits. Nothing is sent if
+        the transaction rolls back.
+        
+        Args:
+            payloads (list): ``(user_id, notification_data)`` pairs
+        """
+        pending = self._get_bus_buffer()
+        for user_id, notification_data in payloads:
+            pending[user_id].append(notification_data)
+    
+    @api.model
+    def _queue_bus_changes(self, user_ids):
+        """Tell users at the end of the transaction that their notifications changed.
+        
+        Users without new notifications get a ``notification_state``
+        message with their unread count and version, e.g. after
+        notifications were read or dismissed from another tab or device.
+        
+        Args:
+            user_ids (iterable): IDs of the users whose counter changed
+        """
+        pending = self._get_bus_buffer()
+        for user_id in user_ids:
+            if user_id:
+                pending.setdefault(user_id, [])
+    
+    @api.model
+    def _get_bus_buffer(self):
+        """Return the bus payloads pending for the current transaction.
+        
+        Returns:
+            defaultdict: Mapping of user ID to its new notifications
+        """
+        data = self.env.cr.precommit.data
+        if 'notification_bell.bus' not in data:
+            data['notification_bell.bus'] = defaultdict(list)
+            self.env.cr.precommit.add(self._flush_bus_payloads)
+        return data['notification_bell.bus']
+    
+    def _flush_bus_payloads(self):
+        """Send the payloads collected by ``_queue_bus_payloads``.
         
-        channel = f'notification_bell_{notification.user_id.id}'
-        self.env['bus.bus']._sendone(channel, 'new_notification', notification_data)
+        Every message carries the unread count and the version of the
+        recipient, read from the counters in one query, so that clients
+        never have to ask for them. Notifications that no longer exist,
+        e.g. because they were created inside a savepoint that was rolled
+        back, are left out.
+        """
+        pending = self.env.cr.precommit.data.pop('notification_bell.bus', None)
+        if not pending:
+            return
+        ids = [data['id'] for notifications in pending.values() for data in notifications]
+        existing = set()
+        if ids:
+            self.env.cr.execute('SELECT id FROM user_notification WHERE id IN %s', [tuple(ids)])
+            existing = {row[0] for row in self.env.cr.fetchall()}
+        self.env.cr.execute(
+            'SELECT user_id, unread_count, version FROM user_notification_counter WHERE user_id IN %s',
+            [tuple(pending)],
+        )
+        counters = {user_id: (unread_count, version) for user_id, unread_count, version in self.env.cr.fetchall()}
+        broadcasts = self.env['user.notification.broadcast']._get_unread_counts(list(pending))
+        for user_id, notifications in pending.items():
+            unread_count, version = counters.get(user_id, (0, 0))
+            state = {'unread_count': max(unread_count, 0) + broadcasts.get(user_id, 0), 'version': version}
+            notifications = [data for data in notifications if data['id'] in existing]
+            if notifications:
+                self._send_bus_message(
+                    f'notification_bell_{user_id}',
+                    'new_notification',
+                    dict(state, notifications=notifications),
+                )
+            else:
+                self._send_bus_message(f'notification_bell_{user_id}', 'notification_state', state)
+    
+    @api.model
+    def _send_bus_message(self, channel, message_type, payload):
+        """Send one message on the bus.
+        
+        Every bus message of the module goes through this method, so it can
+        be replaced by a local stand-in, e.g. to measure the bus fan-out
+        without a running longpolling server.
+        
+        Args:
+            channel (str): Bus channel
+            message_type (str): Type of the message
+            payload (dict): Content of the message
+        """
+        self.env['bus.bus']._sendone(channel, message_type, payload)
+        metrics.inc('notification_bell_bus_messages_total', type=message_type)
     
     @api.model
     def get_unread_count(self, user_id=None):
         """Get count of unread notifications for a user.
         
+        Reads the counter kept by ``user.notification.counter`` instead of
+        counting the notification rows, plus the unread broadcasts.
+        
         Args:
             user_id (int, optional): The user ID to check for.
                 If not provided, uses the current user.
@@ -161,19 +1076,20 @@ class UserNotification(models.Model):
         Returns:
             int: Number of unread notifications
         """
-        domain = [('state', '=', 'unread'), ('active', '=', True)]
-        if user_id:
-            domain.append(('user_id', '=', user_id))
-        else:
-            domain.append(('user_id', '=', self.env.user.id))
-        
-        return self.search_count(domain)
+        user_id = user_id or self.env.user.id
+        return (self.env['user.notification.counter']._get_unread_count(user_id)
+                + self.env['user.notification.broadcast']._get_unread_counts([user_id]).get(user_id, 0))
     
     @api.model
     def action_open_record(self, notification_id=None):
         """
         Mark notification as read and return action to open related record
         
+        The ownership check and the state change are a single conditional
+        UPDATE returning the target of the notification; only notifications
+        that were already read need a second query. Window actions are
+        resolved through the ``_get_window_action`` cache.
+        
         Args:
             notification_id (int, optional): The notification ID to open.
                 If not provided, try to get it from context.
@@ -185,38 +1101,50 @@ class UserNotification(models.Model):
             notification_id = self.env.context.get('notification_id')
             if not notification_id:
                 return False
-                
-        notification = self.browse(notification_id)
-        if notification.user_id.id != self.env.uid:
-            return False
-            
-        notification.sudo().write({"state": "read", "read_date": fields.Datetime.now()})
         
-        if notification.action_type:
-            if notification.action_type == 'url' and notification.action_url:
+        columns = [
+            'action_type', 'action_url', 'action_id', 'action_xml_id',
+            'action_context', 'res_model', 'res_id',
+        ]
+        where = SQL('id = %s AND user_id = %s', notification_id, self.env.uid)
+        rows = self._mark_as_read(where, returning=columns)
+        if not rows:
+            self.flush_model(columns)
+            self.env.cr.execute(SQL(
+                'SELECT %s FROM user_notification WHERE %s',
+                SQL(', ').join(SQL.identifier(fname) for fname in columns),
+                where,
+            ))
+            rows = self.env.cr.dictfetchall()
+            if not rows:
+                return False
+        notification = rows[0]
+        
+        if notification['action_type']:
+            if notification['action_type'] == 'url' and notification['action_url']:
                 return {
                     'type': 'ir.actions.act_url',
-                    'url': notification.action_url,
+                    'url': notification['action_url'],
                     'target': 'new',
                 }
-            elif notification.action_type == 'window':
-                if notification.action_id:
-                    action = notification.action_id.read()[0]
-                elif notification.action_xml_id:
-                    action = self.env.ref(notification.action_xml_id).read()[0]
+            elif notification['action_type'] == 'window':
+                if not (notification['action_id'] or notification['action_xml_id']):
+                    return True
+                action = dict(self._get_window_action(
+                    notification['action_id'] or False, notification['action_xml_id'] or False))
                     
-                if notification.action_context:
+                if notification['action_context']:
                     try:
-                        context = json.loads(notification.action_context)
+                        context = json.loads(notification['action_context'])
                         action['context'] = context
                     except:
                         pass
                 return action
-            elif notification.action_type == 'record' and notification.res_model and notification.res_id:
+            elif notification['action_type'] == 'record' and notification['res_model'] and notification['res_id']:
                 return {
                     'type': 'ir.actions.act_window',
-                    'res_model': notification.res_model,
-                    'res_id': notification.res_id,
+                    'res_model': notification['res_model'],
+                    'res_id': notification['res_id'],
                     'views': [(False, 'form')],
                     'view_mode': 'form',
                     'target': 'current',
@@ -224,19 +1152,41 @@ class UserNotification(models.Model):
         
         return True
     
+    @api.model
+    @tools.ormcache('action_id', 'xml_id', 'self.env.uid', 'self.env.lang')
+    def _get_window_action(self, action_id, xml_id):
+        """Resolve the action of a window notification, from the cache.
+        
+        ``ir.actions`` clears the registry cache whenever an action is
+        created, changed or deleted, so cached actions never go stale.
+        Actions are read with the access rights of the user, so the cache
+        is per user: an action one user may not read is never served to
+        them from another user's call. Callers must copy the result before
+        changing it.
+        
+        Args:
+            action_id (int): ID of the action, takes precedence
+            xml_id (str): XML ID of the action
+            
+        Returns:
+            dict: Action dictionary
+        """
+        if action_id:
+            action = self.env['ir.actions.actions'].browse(action_id)
+            return self.env[action.type].browse(action_id).read()[0]
+        return self.env['ir.actions.actions']._for_xml_id(xml_id)
+    
     def dismiss_notification(self):
         """Dismiss notification by setting it to inactive.
         
         Sets the notification to inactive state so it's no longer visible
         in notification lists but remains in the database for history.
+        The whole recordset is updated with a single UPDATE.
         
         Returns:
             bool: True indicating success
         """
-        for notification in self:
-            notification.write({
-                'active': False
-            })
+        self._dismiss(self._where_ids())
         return True
         
     @api.model
@@ -244,45 +1194,179 @@ class UserNotification(models.Model):
         """Make JSON-RPC call from OWL Component.
         
         This method allows OWL components to make RPC calls without 
-        relying on the default rpc service. It proxies the call to
-        the appropriate controller method.
+        relying on the default rpc service. The route is looked up in
+        ``_json_rpc_routes`` and the matching method is called.
         
         Args:
             route (str): The route to call
             params (dict, optional): Parameters to pass to the route
             
         Returns:
-            dict: The result from the controller
+            dict: The result of the route
+        """
+        if route not in self._json_rpc_routes:
+            return {'error': 'Route not found'}
+        method, with_count = self._json_rpc_routes[route]
+        with metrics.timed(route, self.env.cr):
+            result = getattr(self, method)(**(params or {}))
+            if with_count and not result.get('not_modified'):
+                result = dict(result, unread_count=self.get_unread_count())
+        if result.get('notifications'):
+            metrics.inc('notification_bell_rows_returned_total', len(result['notifications']), route=route)
+        return result
+    
+    @api.model
+    def json_rpc_batch(self, calls):
+        """Run several JSON-RPC routes in a single call and transaction.
+        
+        The unread count is read once, after the last call, instead of
+        once per route. If a call fails, the whole batch is rolled back.
+        
+        Example::
+        
+            json_rpc('/notification_bell/batch', {'calls': [
+                {'route': '/notification_bell/open_notification', 'params': {'notification_id': 42}},
+                {'route': '/notification_bell/sync', 'params': {'since_version': 17}},
+            ]})
+        
+        Args:
+            calls (list): ``{'route': ..., 'params': {...}}`` dictionaries
+            
+        Returns:
+            dict: ``results`` of the calls, in order, and ``unread_count``
+        """
+        results = []
+        for call in calls:
+            route = self._json_rpc_routes.get(call.get('route'))
+            if not route or route[0] == 'json_rpc_batch':
+                results.append({'error': 'Route not found'})
+                continue
+            results.append(getattr(self, route[0])(**(call.get('params') or {})))
+        return {'results': results, 'unread_count': self.get_unread_count()}
+    
+    @api.model
+    def _rpc_mark_as_read(self, notification_id=None, all_notifications=False):
+        """Mark one or all notifications of the current user as read.
+        
+        Negative IDs are broadcasts, see ``user.notification.broadcast``.
+        """
+        Broadcast = self.env['user.notification.broadcast']
+        domain = [('user_id', '=', self.env.uid)]
+        if all_notifications:
+            self.mark_as_read_domain(domain)
+            Broadcast._set_receipts(self.env.uid, Broadcast._get_user_broadcast_ids(self.env.uid), read=True)
+        elif notification_id and notification_id < 0:
+            Broadcast._set_receipts(self.env.uid, [-notification_id], read=True)
+        elif notification_id:
+            self.mark_as_read_domain(domain + [('id', '=', notification_id)])
+        return {'success': True}
+    
+    @api.model
+    def _rpc_mark_as_unread(self, notification_id):
+        """Mark a notification of the current user as unread."""
+        if notification_id < 0:
+            self.env['user.notification.broadcast']._set_receipts(self.env.uid, [-notification_id], read=False)
+        else:
+            self.mark_as_unread_domain([('id', '=', notification_id), ('user_id', '=', self.env.uid)])
+        return {'success': True}
+    
+    @api.model
+    def _rpc_dismiss_notification(self, notification_id):
+        """Dismiss a notification of the current user."""
+        if notification_id < 0:
+            dismissed_ids = self.env['user.notification.broadcast']._set_receipts(
+                self.env.uid, [-notification_id], dismissed=True)
+        else:
+            dismissed_ids = self.dismiss_domain([('id', '=', notification_id), ('user_id', '=', self.env.uid)])
+        return {'success': bool(dismissed_ids)}
+    
+    @api.model
+    def _rpc_open_notification(self, notification_id):
+        """Mark a notification as read and get the action opening its target."""
+        if notification_id < 0:
+            return {'action': self._open_broadcast(-notification_id)}
+        return {'action': self.action_open_record(notification_id)}
+    
+    @api.model
+    def _open_broadcast(self, broadcast_id):
+        """Mark a broadcast as read and get the action opening its document.
+        
+        Args:
+            broadcast_id (int): ID of the broadcast
+            
+        Returns:
+            dict or bool: Action to open the document, True if the broadcast
+                has none and False if it is not shown to the user
         """
-        if params is None:
-            params = {}
+        Broadcast = self.env['user.notification.broadcast']
+        if broadcast_id not in Broadcast._get_user_broadcast_ids(self.env.uid):
+            return False
+        Broadcast._set_receipts(self.env.uid, [broadcast_id], read=True)
+        broadcast = Broadcast.sudo().browse(broadcast_id)
+        if broadcast.res_model and broadcast.res_id:
+            return {
+                'type': 'ir.actions.act_window',
+                'res_model': broadcast.res_model,
+                'res_id': broadcast.res_id,
+                'views': [(False, 'form')],
+                'view_mode': 'form',
+                'target': 'current',
+            }
+        return True
+    
+    @api.model
+    def _rpc_get_unread_count(self, etag=None):
+        """Check the version tag of the current user, ``json_rpc`` adds the unread count.
+        
+        Args:
+            etag (str, optional): ``etag`` of the last response
             
-        if route == '/notification_bell/get_notifications':
-            from ..controllers.main import NotificationController
-            controller = NotificationController()
-            return controller.get_notifications(**params)
-        elif route == '/notification_bell/mark_as_read':
-            from ..controllers.main import NotificationController
-            controller = NotificationController()
-            return controller.mark_as_read(**params)
-        elif route == '/notification_bell/mark_as_unread':
-            from ..controllers.main import NotificationController
-            controller = NotificationController()
-            return controller.mark_as_unread(**params)
-        elif route == '/notification_bell/get_unread_count':
-            from ..controllers.main import NotificationController
-            controller = NotificationController()
-            return controller.get_unread_count()
-        elif route == '/notification_bell/dismiss_notification':
-            from ..controllers.main import NotificationController
-            controller = NotificationController()
-            return controller.dismiss_notification(**params)
+        Returns:
+            dict: ``not_modified`` when the tag did not change, the current
+                ``etag`` otherwise
+        """
+        current = self._get_etag()
+        if etag and etag == current:
+            return {'not_modified': True, 'etag': current}
+        return {'etag': current}
+    
+    @api.model
+    def _get_etag(self, version=None, limit=None):
+        """Return the version tag of everything the bell shows to the current user.
+        
+        The tag combines the version of the user's counter, bumped by every
+        creation, state change, dismissal and purge of their notifications,
+        the stamp of the active broadcasts and a stamp of the user's
+        settings and of the page size; the stamps come from the caches. Once
+        they are warm, it costs one indexed SELECT and no ORM search, so clients can
+        send it back to be told that nothing changed.
         
-        return {'error': 'Route not found'}
+        Args:
+            version (int, optional): Counter version already read by the
+                caller, saves the query
+            limit (int, optional): Page size asked by the client, defaults
+                to the user's notifications limit
+            
+        Returns:
+            str: Version tag, ``<version>.<broadcasts stamp>.<settings stamp>``
+        """
+        if version is None:
+            self.env.cr.execute(
+                'SELECT version FROM user_notification_counter WHERE user_id = %s', [self.env.user.id])
+            row = self.env.cr.fetchone()
+            version = row[0] if row else 0
+        settings = self.env['user.notification.settings'].get_user_settings_values()
+        settings_stamp = '%x' % zlib.crc32(repr((
+            limit or settings['notifications_limit'],
+            settings['notifications_limit'],
+            settings['delivery_mode'],
+        )).encode())
+        return f"{version}.{self.env['user.notification.broadcast']._get_stamp()}.{settings_stamp}"
     
     @api.model
     def send_notification(self, user_id, name, message, res_model=False, 
-                          res_id=False, notification_type='info'):
+                          res_id=False, notification_type='info', enqueue=False, priority='1',
+                          collapse_key=False, collapse_window=None):
         """Create notification from anywhere in the system.
         
         Helper method to easily create notifications from other modules.
@@ -296,11 +1380,21 @@ class UserNotification(models.Model):
             res_id (int, optional): Related record ID
             notification_type (str, optional): Type of notification
                 (info, success, warning, danger)
+            enqueue (bool, optional): Only queue the notification; it is
+                created by the queue drainer after this transaction
+            priority (str, optional): Queue priority, '0' (high),
+                '1' (normal) or '2' (low)
+            collapse_key (str, optional): Merge into the user's unread
+                notification with the same key, e.g.
+                ``'purchase.order,42,write'``, instead of adding a new one
+            collapse_window (int, optional): Only merge into notifications
+                created less than this many seconds ago
+                (``_collapse_window`` by default)
             
         Returns:
-            UserNotification: Created notification record
+            UserNotification: Created notification record, empty when enqueued
         """
-        return self.create([{
+        return self._send([{
             'user_id': user_id,
             'sender_id': self.env.user.id,
             'name': name,
@@ -309,11 +1403,13 @@ class UserNotification(models.Model):
             'res_id': res_id,
             'notification_type': notification_type,
             'action_type': 'message',
-        }])
+        }], enqueue=enqueue, priority=priority,
+            collapse_key=collapse_key, collapse_window=collapse_window)
     
     @api.model
     def send_window_action_notification(self, user_id, name, message, action_xml_id=False, 
-                               action_id=False, action_context=None, notification_type='info'):
+                               action_id=False, action_context=None, notification_type='info',
+                               enqueue=False, priority='1', collapse_key=False, collapse_window=None):
         """Create a window action notification from anywhere in the system.
         
         Helper method to easily create notifications linked to Odoo actions.
@@ -327,9 +1423,19 @@ class UserNotification(models.Model):
             action_context (dict, optional): Additional context for the action
             notification_type (str, optional): Type of notification
                 (info, success, warning, danger)
+            enqueue (bool, optional): Only queue the notification; it is
+                created by the queue drainer after this transaction
+            priority (str, optional): Queue priority, '0' (high),
+                '1' (normal) or '2' (low)
+            collapse_key (str, optional): Merge into the user's unread
+                notification with the same key, e.g.
+                ``'purchase.order,42,write'``, instead of adding a new one
+            collapse_window (int, optional): Only merge into notifications
+                created less than this many seconds ago
+                (``_collapse_window`` by default)
             
         Returns:
-            UserNotification: Created notification window action
+            UserNotification: Created notification window action, empty when enqueued
         """
         vals = {
             'user_id': user_id,
@@ -349,10 +1455,12 @@ class UserNotification(models.Model):
         if action_context:
             vals['action_context'] = json.dumps(action_context)
             
-        return self.create([vals])
+        return self._send([vals], enqueue=enqueue, priority=priority,
+                          collapse_key=collapse_key, collapse_window=collapse_window)
 
     @api.model
-    def send_url_action_notification(self, user_id, name, message, url, notification_type='info'):
+    def send_url_action_notification(self, user_id, name, message, url, notification_type='info',
+                                     enqueue=False, priority='1', collapse_key=False, collapse_window=None):
         """Create a URL action notification from anywhere in the system.
         
         Helper method to easily create notifications linked to external URLs.
@@ -364,9 +1472,19 @@ class UserNotification(models.Model):
             url (str): URL to open when clicking on the notification
             notification_type (str, optional): Type of notification
                 (info, success, warning, danger)
+            enqueue (bool, optional): Only queue the notification; it is
+                created by the queue drainer after this transaction
+            priority (str, optional): Queue priority, '0' (high),
+                '1' (normal) or '2' (low)
+            collapse_key (str, optional): Merge into the user's unread
+                notification with the same key, e.g.
+                ``'purchase.order,42,write'``, instead of adding a new one
+            collapse_window (int, optional): Only merge into notifications
+                created less than this many seconds ago
+                (``_collapse_window`` by default)
             
         Returns:
-            UserNotification: Created notification record
+            UserNotification: Created notification record, empty when enqueued
         """
         vals = {
             'user_id': user_id,
@@ -378,10 +1496,13 @@ class UserNotification(models.Model):
             'action_url': url,
         }
             
-        return self.create([vals])
+        return self._send([vals], enqueue=enqueue, priority=priority,
+                          collapse_key=collapse_key, collapse_window=collapse_window)
 
     @api.model
-    def send_record_action_notification(self, user_id, name, message, res_model, res_id, notification_type='info'):
+    def send_record_action_notification(self, user_id, name, message, res_model, res_id, notification_type='info',
+                                        enqueue=False, priority='1', collapse_key=False,
+                                        collapse_window=None):
         """Create a record action notification from anywhere in the system.
         
         Helper method to easily create notifications linked to specific Odoo records.
@@ -395,9 +1516,19 @@ class UserNotification(models.Model):
             res_id (int): ID of the record to open
             notification_type (str, optional): Type of notification
                 (info, success, warning, danger)
+            enqueue (bool, optional): Only queue the notification; it is
+                created by the queue drainer after this transaction
+            priority (str, optional): Queue priority, '0' (high),
+                '1' (normal) or '2' (low)
+            collapse_key (str, optional): Merge into the user's unread
+                notification with the same key, e.g.
+                ``'purchase.order,42,write'``, instead of adding a new one
+            collapse_window (int, optional): Only merge into notifications
+                created less than this many seconds ago
+                (``_collapse_window`` by default)
             
         Returns:
-            UserNotification: Created notification record
+            UserNotification: Created notification record, empty when enqueued
         """
         vals = {
             'user_id': user_id,
@@ -410,21 +1541,806 @@ class UserNotification(models.Model):
             'res_id': res_id,
         }
             
-        return self.create([vals]) 
+        return self._send([vals], enqueue=enqueue, priority=priority,
+                          collapse_key=collapse_key, collapse_window=collapse_window)
     
     @api.model
-    def get_notifications(self, limit=None):
-        """Fetch all and unread notifications for the current user."""
-        user_id = self.env.user.id
+    def _send(self, vals_list, enqueue=False, priority='1', collapse_key=False, collapse_window=None):
+        """Create notifications, or queue them for the drainer.
+        
+        Args:
+            vals_list (list): Values of the notifications
+            enqueue (bool, optional): Queue the notifications instead of
+                creating them in this transaction
+            priority (str, optional): Queue priority when enqueued
+            collapse_key (str, optional): Collapse key of the notifications
+            collapse_window (int, optional): Collapse window in seconds
+            
+        Returns:
+            UserNotification: Created notifications, empty when enqueued
+        """
+        if collapse_key:
+            vals_list = [
+                dict(vals, collapse_key=collapse_key, collapse_window=collapse_window)
+                for vals in vals_list
+            ]
+        if enqueue:
+            self.env['user.notification.queue'].enqueue(vals_list, priority=priority)
+            metrics.inc('notification_bell_notifications_sent_total', len(vals_list), mode='queued')
+            return self.browse()
+        with metrics.timed_send('single', self.env.cr):
+            records = self.create(vals_list)
+        metrics.inc('notification_bell_notifications_sent_total', len(records), mode='single')
+        return records
+
+    @api.model
+    def send_notification_bulk(self, user_ids, name, message, res_model=False,
+                               res_id=False, notification_type='info', **values):
+        """Send the same notification to many users at once.
+
+        In superuser mode (``sudo()``) the rows are written with multi-row
+        INSERT statements of ``_bulk_batch_size`` rows each, skipping the
+        per-record work of the ORM ``create``. Without superuser rights, or
+        with a ``collapse_key``, the batches go through ``create`` so that
+        access rules and collapsing still apply.
+
+        Args:
+            user_ids (list): IDs of the users to notify
+            name (str): Notification title
+            message (str): Notification message
+            res_model (str, optional): Related model name
+            res_id (int, optional): Related record ID
+            notification_type (str, optional): Type of notification
+                (info, success, warning, danger)
+            **values: Other notification values, e.g. ``action_type``,
+                ``action_url``, ``action_xml_id`` or ``action_context``
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        vals = {
+            'sender_id': self.env.user.id,
+            'name': name,
+            'message': message,
+            'res_model': res_model,
+            'res_id': res_id,
+            'notification_type': notification_type,
+            'action_type': 'message',
+            **values,
+        }
+        if vals.get('action_context') and not isinstance(vals['action_context'], str):
+            vals['action_context'] = json.dumps(vals['action_context'])
+
+        return self._send_bulk(user_ids, vals)
+
+    @api.model
+    def send_template(self, template, user_ids, params=None, params_by_user=None,
+                      notification_type='info', **values):
+        """Send a templated notification to one or many users.
+
+        The notifications only store a reference to the template and their
+        parameters; title and message are rendered when they are read.
+
+        Example::
+
+            template = env.ref('my_module.template_order_late')
+            env['user.notification'].sudo().send_template(
+                template, users.ids,
+                params={'order': order.name},
+                params_by_user={user.id: {'name': user.name} for user in users},
+            )
+
+        Args:
+            template (user.notification.template|int|str): Template record,
+                ID or XML ID
+            user_ids (list): IDs of the users to notify
+            params (dict, optional): Placeholder values shared by all users
+            params_by_user (dict, optional): Placeholder values per user ID,
+                overriding ``params``
+            notification_type (str, optional): Type of notification
+                (info, success, warning, danger)
+            **values: Other notification values, e.g. ``res_model`` and
+                ``res_id`` or ``action_type``
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        if isinstance(template, str):
+            template = self.env.ref(template)
+        template_id = template if isinstance(template, int) else template.id
+        vals = {
+            'sender_id': self.env.user.id,
+            'template_id': template_id,
+            'template_params': params or {},
+            'notification_type': notification_type,
+            'action_type': 'message',
+            **values,
+        }
+        return self._send_bulk(user_ids, vals, params_by_user=params_by_user)
+
+    @api.model
+    def _send_bulk(self, user_ids, vals, params_by_user=None):
+        """Create the same notification for many users.
+
+        Args:
+            user_ids (list): IDs of the users to notify
+            vals (dict): Values shared by all the notifications, with
+                ``template_params`` given as a dictionary
+            params_by_user (dict, optional): Template parameters per user ID
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        mute_index = self.env['user.notification.mute']._get_mute_index()
+        if mute_index:
+            user_ids = [user_id for user_id in user_ids if not self._is_muted_for(mute_index, user_id, vals)]
+        if self.env.su and not vals.get('collapse_key') and self._get_rate_limits():
+            allowed = self._apply_rate_limits([
+                dict(vals, user_id=user_id,
+                     template_params=self._user_template_params(vals, params_by_user, user_id))
+                for user_id in user_ids
+            ])
+            user_ids = [allowed_vals['user_id'] for allowed_vals in allowed]
+        with metrics.timed_send('bulk', self.env.cr):
+            if not self.env.su or vals.get('collapse_key'):
+                ids = []
+                for batch in split_every(self._bulk_batch_size, user_ids):
+                    ids += self.create([
+                        dict(vals, user_id=user_id,
+                             template_params=self._user_template_params(vals, params_by_user, user_id))
+                        for user_id in batch
+                    ]).ids
+                records = self.browse(ids)
+            else:
+                records = self._bulk_insert(user_ids, vals, params_by_user)
+        metrics.inc('notification_bell_notifications_sent_total', len(records), mode='bulk')
+        return records
+
+    @api.model
+    def _user_template_params(self, vals, params_by_user, user_id):
+        """Build the JSON encoded template parameters of one recipient.
+
+        Args:
+            vals (dict): Shared values, with ``template_params`` as a dictionary
+            params_by_user (dict): Template parameters per user ID, or None
+            user_id (int): ID of the recipient
+
+        Returns:
+            str: JSON encoded parameters, or False without a template
+        """
+        if not vals.get('template_id'):
+            return False
+        params = dict(vals.get('template_params') or {})
+        params.update((params_by_user or {}).get(user_id) or {})
+        return json.dumps(params)
+
+    @api.model
+    def send_to_group(self, group, name, message, **kwargs):
+        """Send a notification to every user of a group.
+
+        Args:
+            group (res.groups|int|str): Group record, ID or XML ID
+            name (str): Notification title
+            message (str): Notification message
+            **kwargs: Extra arguments for ``send_notification_bulk``
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        if isinstance(group, str):
+            group = self.env.ref(group)
+        group_id = group if isinstance(group, int) else group.id
+        return self.send_to_domain([('groups_id', 'in', group_id)], name, message, **kwargs)
+
+    @api.model
+    def send_to_domain(self, domain, name, message, **kwargs):
+        """Send a notification to every user matching a domain.
+
+        Recipients are resolved with a single search on ``res.users``.
+
+        Args:
+            domain (list): Domain on ``res.users``
+            name (str): Notification title
+            message (str): Notification message
+            **kwargs: Extra arguments for ``send_notification_bulk``
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        user_ids = self.env['res.users'].search(domain).ids
+        return self.send_notification_bulk(user_ids, name, message, **kwargs)
+
+    def _bulk_insert(self, user_ids, vals, params_by_user=None):
+        """Insert one notification per user with raw multi-row INSERTs.
+
+        This bypasses the ORM ``create`` and its access checks, so it must
+        only be called in superuser mode.
+
+        Args:
+            user_ids (list): IDs of the users to notify
+            vals (dict): Values shared by all the notifications, with
+                ``template_params`` given as a dictionary
+            params_by_user (dict, optional): Template parameters per user ID
+
+        Returns:
+            UserNotification: Created notification records
+        """
+        now = fields.Datetime.now()
+        params_by_user = {
+            user_id: self._user_template_params(vals, params_by_user, user_id)
+            for user_id in user_ids
+        }
+        vals = self._add_missing_default_values(dict(vals, template_params=False))
+        vals.update({
+            'create_uid': self.env.uid,
+            'create_date': now,
+            'write_uid': self.env.uid,
+            'write_date': now,
+        })
+        for fname in ('user_id', 'sync_version', 'template_params', 'digest_period'):
+            vals.pop(fname, None)
+        digest_periods = self.env['user.notification.settings']._get_digest_periods()
+        digest_periods = {
+            user_id: digest_periods[user_id].get(vals['notification_type'])
+            for user_id in user_ids if user_id in digest_periods
+        }
+
+        unread = vals['state'] == 'unread' and bool(vals['active'])
+        versions = self.env['user.notification.counter']._apply_deltas(
+            dict.fromkeys(user_ids, int(unread)))
+
+        columns = ['user_id', 'sync_version', 'template_params', 'digest_period']
+        shared = []
+        for fname, value in vals.items():
+            field = self._fields[fname]
+            if field.store and field.column_type and fname != 'id':
+                columns.append(fname)
+                shared.append(field.convert_to_column(value, self))
+        shared = tuple(shared)
+
+        insert = 'INSERT INTO user_notification (%s) VALUES ' % ', '.join(
+            '"%s"' % column for column in columns)
+        rows = []
+        for batch in split_every(self._bulk_batch_size, user_ids):
+            self.env.cr.execute(
+                insert + ', '.join(['%s'] * len(batch)) + ' RETURNING id, user_id',
+                [(user_id, versions[user_id], params_by_user[user_id] or None,
+                  digest_periods.get(user_id) or None) + shared
+                 for user_id in batch],
+            )
+            rows += self.env.cr.fetchall()
+
+        payload = {
+            'type': vals['notification_type'],
+            'action_type': vals['action_type'],
+            'res_model': vals.get('res_model'),
+            'res_id': vals.get('res_id'),
+            'create_date': fields.Datetime.to_string(now),
+            'sender_name': self.env['res.users'].browse(vals['sender_id']).name,
+            'occurrence_count': 1,
+        }
+        payloads = []
+        for notification_id, user_id in rows:
+            if digest_periods.get(user_id):
+                continue
+            name, message = self._render_content(
+                vals.get('template_id'), params_by_user[user_id], vals.get('name'), vals.get('message'))
+            payloads.append((user_id, dict(payload, id=notification_id, name=name, message=message)))
+        self._queue_bus_payloads(payloads)
+        return self.browse([notification_id for notification_id, _user_id in rows])
+
+    @api.model
+    def _render_content(self, template_id, template_params, name, message):
+        """Return the title and message to display for a notification.
+
+        Args:
+            template_id (int): ID of the notification's template, if any
+            template_params (str): JSON encoded template parameters
+            name (str): Stored title, used without a template
+            message (str): Stored message, used without a template
+
+        Returns:
+            tuple: Title and message
+        """
+        if not template_id:
+            return name, message
+        return self.env['user.notification.template']._render(
+            template_id, json.loads(template_params or '{}'))
+
+    @api.model
+    def get_notifications(self, limit=None, cursor=None):
+        """Fetch a page of notifications for the current user.
         
-        if not limit:
-            settings = self.env['user.notification.settings'].get_user_settings()
-            limit = settings.notifications_limit
+        Same as ``get_bell_snapshot``.
+        
+        Args:
+            limit (int, optional): Maximum number of notifications to return.
+                Defaults to the user's notifications limit.
+            cursor (str, optional): ``next_cursor`` of the previous page
             
-        notifications = self.search([('user_id', '=', user_id), ('active', '=', True)], limit=limit)
-        unread_notifications = notifications.filtered(lambda n: n.state == 'unread')
+        Returns:
+            dict: See ``get_bell_snapshot``
+        """
+        return self.get_bell_snapshot(limit=limit, cursor=cursor)
+    
+    @api.model
+    def get_bell_snapshot(self, limit=None, cursor=None, search=None, etag=None):
+        """Return everything the bell dropdown displays.
         
+        The cost does not depend on the number of notifications: one query
+        reads the page with its sender names, one reads the unread count
+        and version from ``user.notification.counter`` and the settings
+        come from the settings cache. The broadcasts shown to the user are
+        merged into the first page, with one more query when there are any.
+        Dates are converted to the user's timezone in Python.
+        
+        When the ``etag`` of the previous first page is given and nothing
+        changed since, only ``not_modified`` is returned, after a single
+        version lookup.
+        
+        Args:
+            limit (int, optional): Maximum number of notifications to return.
+                Defaults to the user's notifications limit.
+            cursor (str, optional): ``next_cursor`` of the previous page
+            search (str, optional): Only return the notifications matching
+                these words, best matches first, in a single page
+            etag (str, optional): ``etag`` of the previous first page
+            
+        Returns:
+            dict: Notifications, unread count, version, version tag, cursor
+                of the next page and the user's settings, or
+                ``not_modified`` and ``etag``
+        """
+        if etag and not cursor and not search:
+            current = self._get_etag(limit=limit)
+            if etag == current:
+                return {'not_modified': True, 'etag': current}
+        settings = self.env['user.notification.settings'].get_user_settings_values()
+        if search:
+            notifications, next_cursor = self._fetch_search(limit or settings['notifications_limit'], search), False
+        else:
+            limit = limit or settings['notifications_limit']
+            notifications, next_cursor = self._fetch_page(limit, cursor)
+            notifications, next_cursor = self._merge_broadcasts(notifications, next_cursor, limit, cursor)
+        counter = self.env['user.notification.counter']._get_counter(self.env.user.id)
+        broadcasts = self.env['user.notification.broadcast']._get_unread_counts([self.env.user.id])
         return {
-            'notifications': notifications.read(['id', 'name', 'message', 'state', 'create_date', 'sender_id']),
-            'unread_count': len(unread_notifications),
-        }
\ No newline at end of file
+            'notifications': notifications,
+            'unread_count': counter['unread_count'] + broadcasts.get(self.env.user.id, 0),
+            'version': counter['version'],
+            'etag': self._get_etag(counter['version'], limit),
+            'broadcast_stamp': self.env['user.notification.broadcast']._get_stamp(),
+            'next_cursor': next_cursor,
+            'settings': {
+                'notifications_limit': settings['notifications_limit'],
+                'delivery_mode': settings['delivery_mode'],
+            },
+        }
+    
+    @api.model
+    def get_changes(self, since_version=0, broadcast_stamp=None):
+        """Return what changed for the current user since a version.
+        
+        Every creation, state change and dismissal stamps the notification
+        with a new version of its recipient's counter, so the changes are
+        the rows with a greater ``sync_version``. When more rows changed
+        than the dropdown displays, ``reset`` is returned instead and the
+        client should reload the snapshot. Broadcasts are only returned
+        when the user's receipt changed since ``since_version``; when
+        broadcasts were created, changed or archived, i.e. the
+        ``broadcast_stamp`` of the client is outdated, ``reset`` is returned.
+        
+        Args:
+            since_version (int): ``version`` returned by the last snapshot
+                or sync
+            broadcast_stamp (str, optional): ``broadcast_stamp`` returned by
+                the last snapshot or sync
+            
+        Returns:
+            dict: ``version``, ``etag``, ``broadcast_stamp``,
+                ``unread_count``, new or changed ``notifications``,
+                ``dismissed_ids`` and ``reset``
+        """
+        Broadcast = self.env['user.notification.broadcast']
+        counter = self.env['user.notification.counter']._get_counter(self.env.user.id)
+        broadcasts = Broadcast._get_unread_counts([self.env.user.id])
+        stamp = Broadcast._get_stamp()
+        result = {
+            'version': counter['version'],
+            'etag': self._get_etag(counter['version']),
+            'broadcast_stamp': stamp,
+            'unread_count': counter['unread_count'] + broadcasts.get(self.env.user.id, 0),
+            'notifications': [],
+            'dismissed_ids': [],
+            'reset': since_version > counter['version'] or bool(broadcast_stamp and broadcast_stamp != stamp),
+        }
+        if result['reset'] or since_version == counter['version']:
+            return result
+        
+        limit = self.env['user.notification.settings'].get_user_settings_values()['notifications_limit']
+        query = self.with_context(active_test=False)._search(
+            [('user_id', '=', self.env.user.id), ('sync_version', '>', since_version)],
+            limit=limit + 1,
+            order='sync_version, id',
+        )
+        rows = self._select_rows(query)
+        if len(rows) > limit:
+            result['reset'] = True
+            return result
+        result['notifications'] = self._format_rows([row for row in rows if row['active']])
+        result['dismissed_ids'] = [row['id'] for row in rows if not row['active']]
+        for entry in Broadcast._get_bell_entries(
+                self.env.user.id, include_dismissed=True, since_version=since_version):
+            if entry.pop('dismissed'):
+                result['dismissed_ids'].append(entry['id'])
+            else:
+                result['notifications'].append(entry)
+        return result
+    
+    @api.model
+    def _merge_broadcasts(self, notifications, next_cursor, limit, cursor=None):
+        """Merge the broadcasts shown to the current user into a page of notifications.
+        
+        Broadcasts are ordered with notifications by ``(create_date, id)``,
+        their ID being negative, and paged with the same cursor: a page
+        holds the first ``limit`` notifications and broadcasts after the
+        cursor, and the next one starts after the last of them.
+        
+        Args:
+            notifications (list): Notification dicts of the page, newest first
+            next_cursor (str): Cursor of the next page of notifications,
+                False on the last page
+            limit (int): Maximum number of entries of the page
+            cursor (str, optional): Cursor the page starts after
+            
+        Returns:
+            tuple: Notification and broadcast dicts, newest first, and the
+                cursor of the next page
+        """
+        entries = self.env['user.notification.broadcast']._get_bell_entries(self.env.user.id)
+        if cursor:
+            start = self._decode_cursor(cursor)
+            entries = [entry for entry in entries if self._decode_cursor(entry['cursor']) < start]
+        if not entries:
+            return notifications, next_cursor
+        for entry in entries:
+            entry.pop('dismissed')
+        merged = sorted(
+            notifications + entries,
+            key=lambda data: self._decode_cursor(data['cursor']),
+            reverse=True,
+        )
+        if len(merged) > limit:
+            merged = merged[:limit]
+            next_cursor = merged[-1]['cursor']
+        return merged, next_cursor
+    
+    @api.model
+    def _fetch_search(self, limit, search):
+        """Read the current user's active notifications best matching a search.
+        
+        Args:
+            limit (int): Maximum number of notifications to return
+            search (str): Words to search in titles and messages
+            
+        Returns:
+            list: Notification dicts, ranked by relevance then by date
+        """
+        tsquery = self._get_tsquery(search)
+        if tsquery is None:
+            return []
+        vector = SQL.identifier(self._table, 'search_vector')
+        query = self._search([('user_id', '=', self.env.user.id)], limit=limit)
+        query.add_where(SQL('%s @@ %s', vector, tsquery))
+        query.order = SQL(
+            'ts_rank(%s, %s) DESC, %s DESC',
+            vector, tsquery, SQL.identifier(self._table, 'id'),
+        )
+        return self._format_rows(self._select_rows(query))
+    
+    @api.model
+    def _export_chunk(self, user_id, active, position, limit):
+        """Read one chunk of a user's notification history for an export.
+        
+        Chunks follow each other with a ``(create_date, id)`` keyset on the
+        index of ``(user_id, active, create_date, id)``, so each chunk costs
+        the same and no cursor has to stay open between chunks.
+        
+        Args:
+            user_id (int): ID of the user whose notifications are exported
+            active (bool): Export the active or the dismissed notifications
+            position (tuple): ``(create_date, id)`` of the last exported
+                notification, or None to start from the oldest one
+            limit (int): Maximum number of notifications in the chunk
+            
+        Returns:
+            tuple: List of export row dictionaries and the position of the
+                last one
+        """
+        query = self.with_context(active_test=False)._search(
+            [('user_id', '=', user_id), ('active', '=', active)],
+            limit=limit,
+            order='create_date, id',
+        )
+        if position:
+            query.add_where(SQL(
+                '(%s, %s) > (%s, %s)',
+                SQL.identifier(self._table, 'create_date'),
+                SQL.identifier(self._table, 'id'),
+                *position,
+            ))
+        rows = self._select_rows(query, extra_columns=('read_date', 'res_model', 'res_id'))
+        if not rows:
+            return [], position
+        export = []
+        for row in rows:
+            name, message = self._render_content(
+                row['template_id'], row['template_params'], row['name'], row['message'])
+            export.append({
+                'id': row['id'],
+                'create_date': fields.Datetime.to_string(row['create_date']),
+                'sender': row['sender_name'],
+                'type': row['notification_type'],
+                'title': name,
+                'message': message,
+                'state': row['state'],
+                'read_date': fields.Datetime.to_string(row['read_date']) or '',
+                'dismissed': not row['active'],
+                'res_model': row['res_model'] or '',
+                'res_id': row['res_id'] or '',
+            })
+        return export, (rows[-1]['create_date'], rows[-1]['id'])
+    
+    @api.model
+    def _fetch_page(self, limit, cursor=None):
+        """Read one page of the current user's active notifications.
+        
+        Pages are delimited by a ``(create_date, id)`` cursor instead of an
+        offset: the index on ``(user_id, active, create_date, id)`` is
+        entered right after the last row of the previous page, so a page
+        costs the same however far back it is.
+        
+        Args:
+            limit (int): Maximum number of notifications to return
+            cursor (str, optional): ``next_cursor`` of the previous page
+            
+        Returns:
+            tuple: List of notification dicts and the cursor of the next
+                page, or False if this is the last page
+        """
+        query = self._search(
+            [('user_id', '=', self.env.user.id)],
+            limit=limit,
+            order='create_date desc, id desc',
+        )
+        if cursor:
+            query.add_where(SQL(
+                '(%s, %s) < (%s, %s)',
+                SQL.identifier(self._table, 'create_date'),
+                SQL.identifier(self._table, 'id'),
+                *self._decode_cursor(cursor),
+            ))
+        rows = self._select_rows(query)
+        
+        next_cursor = False
+        if limit and len(rows) == limit:
+            next_cursor = self._encode_cursor(rows[-1]['create_date'], rows[-1]['id'])
+        return self._format_rows(rows), next_cursor
+    
+    @api.model
+    def _select_rows(self, query, extra_columns=()):
+        """Run a notification query, reading sender names in the same query.
+        
+        Args:
+            query (Query): Query on ``user.notification``, e.g. from ``_search``
+            extra_columns (tuple, optional): Other columns to read
+            
+        Returns:
+            list: Raw row dictionaries
+        """
+        sender_id = SQL.identifier(self._table, 'sender_id')
+        self.env.cr.execute(query.select(
+            *(SQL.identifier(self._table, fname) for fname in (
+                'id', 'create_date', 'name', 'message', 'state',
+                'notification_type', 'active', 'sync_version', 'sender_id',
+                'template_id', 'template_params', 'occurrence_count',
+                *extra_columns,
+            )),
+            SQL("""(SELECT partner.name
+                      FROM res_users sender
+                      JOIN res_partner partner ON partner.id = sender.partner_id
+                     WHERE sender.id = %s) AS sender_name""", sender_id),
+        ))
+        return self.env.cr.dictfetchall()
+    
+    @api.model
+    def _format_rows(self, rows):
+        """Format rows from ``_select_rows`` for the bell.
+        
+        Args:
+            rows (list): Raw row dictionaries
+            
+        Returns:
+            list: Notification dictionaries, with dates in the user's timezone
+                and the ``cursor`` of their position, which lets clients
+                cut a list back and continue it from its last row
+        """
+        user_tz = pytz.timezone(self.env.user.tz or 'UTC')
+        for row in rows:
+            row['name'], row['message'] = self._render_content(
+                row['template_id'], row['template_params'], row['name'], row['message'])
+        return [{
+            'id': row['id'],
+            'name': row['name'],
+            'message': row['message'],
+            'create_date': pytz.utc.localize(row['create_date']).astimezone(user_tz).strftime(
+                '%Y-%m-%d %H:%M:%S') if row['create_date'] else False,
+            'state': row['state'],
+            'type': row['notification_type'],
+            'sender_name': row['sender_name'],
+            'sender_id': row['sender_id'],
+            'occurrence_count': row['occurrence_count'],
+            'cursor': self._encode_cursor(row['create_date'], row['id']) if row['create_date'] else False,
+        } for row in rows]
+    
+    @api.model
+    def _encode_cursor(self, create_date, notification_id):
+        """Encode the position of a notification as an opaque cursor.
+        
+        Args:
+            create_date (datetime): Creation date of the notification
+            notification_id (int): ID of the notification
+            
+        Returns:
+            str: URL-safe cursor
+        """
+        position = f'{create_date.isoformat()},{notification_id}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+    
+    @api.model
+    def _decode_cursor(self, cursor):
+        """Decode a cursor built by ``_encode_cursor``.
+        
+        Args:
+            cursor (str): Cursor received from the client
+            
+        Returns:
+            tuple: Creation date and ID of the notification
+        """
+        try:
+            create_date, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(',')
+            return datetime.fromisoformat(create_date), int(notification_id)
+        except (ValueError, UnicodeError):
+            raise UserError(_("Invalid notification cursor."))
+    
+    @api.model
+    def _cron_send_digests(self, period):
+        """Scheduled action announcing the notifications gathered for digests.
+        
+        All the notifications pending for ``period`` are released and
+        counted per recipient in a single statement; rows locked by other
+        transactions are left for the next run. Each recipient with unread
+        notifications among them then gets one summary notification, pushed
+        on the bus like any real-time notification.
+        
+        Args:
+            period (str): ``'hourly'`` or ``'daily'``
+            
+        Returns:
+            int: Number of digests sent
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            WITH pending AS (
+                UPDATE user_notification
+                   SET digest_period = NULL
+                 WHERE id IN (SELECT id
+                                FROM user_notification
+                               WHERE digest_period = %s
+                                 FOR UPDATE SKIP LOCKED)
+             RETURNING id, user_id, state, active
+            )
+            SELECT user_id,
+                   count(*) AS count,
+                   (array_agg(id ORDER BY id DESC))[1:3] AS latest_ids
+              FROM pending
+             WHERE state = 'unread' AND active
+          GROUP BY user_id
+        """, [period])
+        rows = self.env.cr.dictfetchall()
+        self.invalidate_model(['digest_period'])
+        if not rows:
+            return 0
+        
+        latest = self.browse([notification_id for row in rows for notification_id in row['latest_ids']])
+        titles = {notification.id: notification.display_name for notification in latest}
+        title = _("Your hourly digest") if period == 'hourly' else _("Your daily digest")
+        self.sudo()._create_notifications([{
+            'user_id': row['user_id'],
+            'sender_id': self.env.uid,
+            'name': title,
+            'message': _("%(count)s new notifications, including: %(titles)s",
+                         count=row['count'],
+                         titles=', '.join(titles[notification_id] or '' for notification_id in row['latest_ids'])),
+            'notification_type': 'info',
+            'digest_period': False,
+        } for row in rows])
+        _logger.info("Sent %s %s notification digests", len(rows), period)
+        return len(rows)
+    
+    @api.model
+    def _cron_purge_expired(self, chunk_size=5000):
+        """Delete notifications that are past their retention period.
+        
+        Read notifications are kept ``notification_bell.read_retention_days``
+        days after being read and dismissed ones
+        ``notification_bell.dismissed_retention_days`` days after being
+        dismissed; 0 keeps them forever. Rows are deleted in chunks of
+        ``chunk_size``, each in its own short transaction, and rows locked
+        by other transactions are skipped until the next run. Read and
+        dismissed rows are purged separately, each through its own partial
+        index, so every chunk starts from the oldest expired row instead
+        of scanning the table again. Unread, active notifications are
+        never deleted, so the unread counters are not affected, but the
+        versions of the users who lost rows are bumped in the same
+        transaction so that their clients reload.
+        
+        Args:
+            chunk_size (int, optional): Number of rows deleted per transaction
+            
+        Returns:
+            dict: Number of read and dismissed notifications deleted, and
+                the duration of the run in seconds
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        read_days = int(ICP.get_param('notification_bell.read_retention_days', 0))
+        dismissed_days = int(ICP.get_param('notification_bell.dismissed_retention_days', 0))
+        stats = {'read': 0, 'dismissed': 0, 'duration': 0.0}
+        conditions = {}
+        now = fields.Datetime.now()
+        if read_days > 0:
+            conditions['read'] = SQL(
+                "state = 'read' AND active AND COALESCE(read_date, create_date) < %s",
+                now - timedelta(days=read_days),
+            )
+        if dismissed_days > 0:
+            conditions['dismissed'] = SQL(
+                "NOT active AND write_date < %s",
+                now - timedelta(days=dismissed_days),
+            )
+        if not conditions:
+            return stats
+        
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        start = time.monotonic()
+        for kind, condition in conditions.items():
+            while True:
+                self.env.cr.execute(SQL(
+                    """
+                    DELETE FROM user_notification
+                     WHERE id IN (
+                            SELECT id FROM user_notification
+                             WHERE %s
+                             LIMIT %s
+                               FOR UPDATE SKIP LOCKED)
+                 RETURNING user_id
+                    """,
+                    condition,
+                    chunk_size,
+                ))
+                rows = self.env.cr.fetchall()
+                stats[kind] += len(rows)
+                self.env['user.notification.counter']._apply_deltas(
+                    dict.fromkeys({user_id for (user_id,) in rows}, 0))
+                if auto_commit:
+                    self.env.cr.commit()
+                if len(rows) < chunk_size:
+                    break
+        self.invalidate_model()
+        stats['duration'] = round(time.monotonic() - start, 3)
+        _logger.info(
+            "Purged expired notifications: %(read)s read and %(dismissed)s dismissed in %(duration)ss",
+            stats,
+        )
+        return stats
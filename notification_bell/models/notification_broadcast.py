@@ -0,0 +1,344 @@
+"""User Notification Broadcast model.
+
+This module defines the Broadcast model, announcements stored once for
+a whole audience, and the Receipt model which holds the state of a
+broadcast for the users who acted on it.
+"""
+
+import zlib
+
+import pytz
+
+from odoo import api, fields, models, tools
+from odoo.tools.safe_eval import safe_eval
+
+
+class UserNotificationBroadcast(models.Model):
+    """User Notification Broadcast Model.
+
+    A broadcast is a single row shown to every user of its audience,
+    instead of one ``user.notification`` per recipient. The audience is
+    resolved once per worker and cached; the state of each user only gets
+    a ``user.notification.broadcast.receipt`` row once they read or dismiss
+    the broadcast. Broadcasts appear in the bell with negative IDs.
+    """
+
+    _name = 'user.notification.broadcast'
+    _description = 'User Notification Broadcast'
+    _order = 'create_date desc, id desc'
+
+    name = fields.Char(string='Title', required=True)
+    message = fields.Text(string='Message', required=True)
+    sender_id = fields.Many2one(
+        'res.users',
+        string='From User',
+        required=True,
+        default=lambda self: self.env.user
+    )
+    notification_type = fields.Selection(
+        [
+            ('info', 'Information'),
+            ('success', 'Success'),
+            ('warning', 'Warning'),
+            ('danger', 'Danger')
+        ],
+        string='Type',
+        default='info'
+    )
+    res_model = fields.Char(string='Related Model')
+    res_id = fields.Integer(string='Related Document ID')
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        help='Only show the broadcast to the users of this company'
+    )
+    group_id = fields.Many2one(
+        'res.groups',
+        string='Group',
+        help='Only show the broadcast to the members of this group'
+    )
+    user_domain = fields.Char(
+        string='Users',
+        default='[]',
+        help='Only show the broadcast to the users matching this domain'
+    )
+    active = fields.Boolean(
+        string='Active',
+        default=True,
+        help='Archive the broadcast to remove it from every bell'
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to expire the broadcast caches and announce the broadcasts.
+
+        A single bus message is sent on the shared broadcast channel,
+        whatever the size of the audience.
+        """
+        records = super(UserNotificationBroadcast, self).create(vals_list)
+        self.env['user.notification.cache.stamp']._bump('broadcast')
+        self.env['user.notification']._send_bus_message(
+            'notification_bell_broadcast', 'new_broadcast', {'ids': [-record.id for record in records]})
+        return records
+
+    def write(self, vals):
+        """Override write to expire the broadcast caches."""
+        result = super(UserNotificationBroadcast, self).write(vals)
+        self.env['user.notification.cache.stamp']._bump('broadcast')
+        return result
+
+    def unlink(self):
+        """Override unlink to expire the broadcast caches."""
+        result = super(UserNotificationBroadcast, self).unlink()
+        self.env['user.notification.cache.stamp']._bump('broadcast')
+        return result
+
+    @api.model
+    @tools.ormcache("self.env['user.notification.cache.stamp']._get_version('broadcast')")
+    def _get_active_broadcasts(self):
+        """Return the IDs of the active broadcasts, newest first, from the cache.
+
+        Returns:
+            tuple: Broadcast IDs
+        """
+        self.flush_model(['active'])
+        self.env.cr.execute(
+            'SELECT id FROM user_notification_broadcast WHERE active ORDER BY create_date DESC, id DESC')
+        return tuple(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    @tools.ormcache("self.env['user.notification.cache.stamp']._get_version('broadcast')")
+    def _get_stamp(self):
+        """Return a stamp of the active broadcasts and their last changes, from the cache.
+
+        Part of the version tag of the bell, see
+        ``user.notification._get_etag``.
+
+        Returns:
+            str: Checksum of the active broadcasts, ``0`` when there is none
+        """
+        self.flush_model(['active'])
+        self.env.cr.execute(
+            'SELECT id, write_date FROM user_notification_broadcast WHERE active ORDER BY id')
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return '0'
+        return '%x' % zlib.crc32(repr(rows).encode())
+
+    @api.model
+    @tools.ormcache('broadcast_id', "self.env['user.notification.cache.stamp']._get_version('broadcast')")
+    def _get_audience(self, broadcast_id):
+        """Resolve the users of a broadcast's audience, from the cache.
+
+        The cache expires when broadcasts change, and the registry cache
+        is cleared when the groups of users change; users created since
+        then only see the broadcast after the next change.
+
+        Args:
+            broadcast_id (int): ID of the broadcast
+
+        Returns:
+            frozenset: IDs of the users of the audience
+        """
+        broadcast = self.sudo().browse(broadcast_id)
+        domain = [('share', '=', False)] + safe_eval(broadcast.user_domain or '[]')
+        if broadcast.company_id:
+            domain.append(('company_ids', 'in', broadcast.company_id.id))
+        if broadcast.group_id:
+            domain.append(('groups_id', 'in', broadcast.group_id.id))
+        return frozenset(self.env['res.users'].sudo()._search(domain))
+
+    @api.model
+    def _get_user_broadcast_ids(self, user_id):
+        """Return the IDs of the active broadcasts shown to a user.
+
+        Args:
+            user_id (int): ID of the user
+
+        Returns:
+            list: Broadcast IDs, newest first
+        """
+        return [
+            broadcast_id for broadcast_id in self._get_active_broadcasts()
+            if user_id in self._get_audience(broadcast_id)
+        ]
+
+    @api.model
+    def _get_unread_counts(self, user_ids):
+        """Count the unread broadcasts of several users.
+
+        Costs no query when there is no active broadcast, and a single
+        query on the receipts otherwise.
+
+        Args:
+            user_ids (list): IDs of the users
+
+        Returns:
+            dict: Mapping of user ID to its number of unread broadcasts,
+                only for users with at least one
+        """
+        if not self._get_active_broadcasts():
+            return {}
+        broadcasts = {user_id: self._get_user_broadcast_ids(user_id) for user_id in user_ids}
+        broadcast_ids = {broadcast_id for ids in broadcasts.values() for broadcast_id in ids}
+        if not broadcast_ids:
+            return {}
+        self.env['user.notification.broadcast.receipt'].flush_model()
+        self.env.cr.execute("""
+            SELECT user_id, count(*)
+              FROM user_notification_broadcast_receipt
+             WHERE user_id IN %s AND broadcast_id IN %s
+               AND (read_date IS NOT NULL OR dismissed)
+          GROUP BY user_id
+        """, [tuple(broadcasts), tuple(broadcast_ids)])
+        done = dict(self.env.cr.fetchall())
+        return {
+            user_id: len(ids) - done.get(user_id, 0)
+            for user_id, ids in broadcasts.items()
+            if len(ids) > done.get(user_id, 0)
+        }
+
+    @api.model
+    def _get_bell_entries(self, user_id, include_dismissed=False, since_version=None):
+        """Return the broadcasts of a user formatted like bell notifications.
+
+        Entries carry the ``cursor`` of their position, the ID being
+        negative, so they can be ordered and paged together with
+        notifications, see ``user.notification._merge_broadcasts``.
+
+        Args:
+            user_id (int): ID of the user
+            include_dismissed (bool, optional): Also return the dismissed
+                broadcasts, flagged with ``dismissed``
+            since_version (int, optional): Only return the broadcasts whose
+                receipt changed after this version of the user's counter
+
+        Returns:
+            list: Notification dicts with negative IDs, newest first
+        """
+        broadcast_ids = self._get_user_broadcast_ids(user_id)
+        if not broadcast_ids:
+            return []
+        self.env['user.notification.broadcast.receipt'].flush_model()
+        self.env.cr.execute("""
+            SELECT broadcast.id, broadcast.create_date, broadcast.name, broadcast.message,
+                   broadcast.notification_type, broadcast.sender_id, partner.name AS sender_name,
+                   receipt.read_date, COALESCE(receipt.dismissed, FALSE) AS dismissed
+              FROM user_notification_broadcast broadcast
+              JOIN res_users sender ON sender.id = broadcast.sender_id
+              JOIN res_partner partner ON partner.id = sender.partner_id
+         LEFT JOIN user_notification_broadcast_receipt receipt
+                ON receipt.broadcast_id = broadcast.id AND receipt.user_id = %s
+             WHERE broadcast.id IN %s
+               AND (%s IS NULL OR receipt.sync_version > %s)
+          ORDER BY broadcast.create_date DESC, broadcast.id DESC
+        """, [user_id, tuple(broadcast_ids), since_version, since_version])
+        user_tz = pytz.timezone(self.env.user.tz or 'UTC')
+        Notification = self.env['user.notification']
+        return [{
+            'id': -row['id'],
+            'name': row['name'],
+            'message': row['message'],
+            'create_date': pytz.utc.localize(row['create_date']).astimezone(user_tz).strftime(
+                '%Y-%m-%d %H:%M:%S'),
+            'state': 'read' if row['read_date'] else 'unread',
+            'type': row['notification_type'],
+            'sender_name': row['sender_name'],
+            'sender_id': row['sender_id'],
+            'occurrence_count': 1,
+            'cursor': Notification._encode_cursor(row['create_date'], -row['id']),
+            'broadcast': True,
+            'dismissed': row['dismissed'],
+        } for row in self.env.cr.dictfetchall() if include_dismissed or not row['dismissed']]
+
+    @api.model
+    def _set_receipts(self, user_id, broadcast_ids, read=None, dismissed=None):
+        """Record that a user read, unread or dismissed broadcasts.
+
+        Receipts are upserted in a single statement and stamped with a new
+        version of the user's counter, so that ``sync`` only returns the
+        broadcasts whose receipt changed. A state message is queued, so
+        that the other tabs and devices of the user update their unread
+        count.
+
+        Args:
+            user_id (int): ID of the user
+            broadcast_ids (list): IDs of the broadcasts, only the ones shown
+                to the user are changed
+            read (bool, optional): Mark the broadcasts as read or unread
+            dismissed (bool, optional): Dismiss the broadcasts
+
+        Returns:
+            list: IDs of the changed broadcasts
+        """
+        visible = set(self._get_user_broadcast_ids(user_id))
+        broadcast_ids = sorted(broadcast_id for broadcast_id in broadcast_ids if broadcast_id in visible)
+        if not broadcast_ids:
+            return []
+        now = self.env.cr.now()
+        read_date = now if read else None
+        version = self.env['user.notification.counter']._apply_deltas({user_id: 0})[user_id]
+        self.env['user.notification.broadcast.receipt'].flush_model()
+        self.env.cr.execute("""
+            INSERT INTO user_notification_broadcast_receipt
+                        (broadcast_id, user_id, read_date, dismissed, sync_version)
+            SELECT broadcast_id, %(user_id)s, %(read_date)s, %(dismissed)s, %(version)s
+              FROM unnest(%(broadcast_ids)s) AS broadcast_id
+            ON CONFLICT (broadcast_id, user_id) DO UPDATE
+            SET read_date = CASE WHEN %(set_read)s
+                                 THEN COALESCE(user_notification_broadcast_receipt.read_date, EXCLUDED.read_date)
+                                 ELSE user_notification_broadcast_receipt.read_date END,
+                dismissed = user_notification_broadcast_receipt.dismissed OR EXCLUDED.dismissed,
+                sync_version = EXCLUDED.sync_version
+        """ if read is not False else """
+            UPDATE user_notification_broadcast_receipt
+               SET read_date = NULL, sync_version = %(version)s
+             WHERE user_id = %(user_id)s AND broadcast_id = ANY(%(broadcast_ids)s)
+        """, {
+            'user_id': user_id,
+            'broadcast_ids': broadcast_ids,
+            'read_date': read_date,
+            'dismissed': bool(dismissed),
+            'set_read': bool(read),
+            'version': version,
+        })
+        self.env['user.notification.broadcast.receipt'].invalidate_model()
+        self.env['user.notification']._queue_bus_changes([user_id])
+        return broadcast_ids
+
+
+class UserNotificationBroadcastReceipt(models.Model):
+    """User Notification Broadcast Receipt Model.
+
+    Holds the state of a broadcast for one user. Rows only exist for the
+    users who read or dismissed the broadcast; every other user of the
+    audience sees it as unread.
+    """
+
+    _name = 'user.notification.broadcast.receipt'
+    _description = 'User Notification Broadcast Receipt'
+    _log_access = False
+
+    broadcast_id = fields.Many2one(
+        'user.notification.broadcast',
+        string='Broadcast',
+        required=True,
+        ondelete='cascade'
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        ondelete='cascade'
+    )
+    read_date = fields.Datetime(string='Read Date')
+    dismissed = fields.Boolean(string='Dismissed', default=False)
+    sync_version = fields.Integer(
+        string='Version',
+        help='Version of the user\'s counter when the receipt last changed'
+    )
+
+    _sql_constraints = [
+        ('broadcast_user_uniq', 'UNIQUE(broadcast_id, user_id)',
+         'A user can only have one receipt per broadcast!')
+    ]
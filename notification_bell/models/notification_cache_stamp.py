@@ -0,0 +1,73 @@
+"""User Notification Cache Stamp model.
+
+This module defines the Cache Stamp model which holds the versions the
+worker caches of the bell are keyed on.
+"""
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class UserNotificationCacheStamp(models.Model):
+    """User Notification Cache Stamp Model.
+
+    A single record, ``notification_bell.cache_stamp``, holds one version
+    per group of cached data. The cached methods of a group have its
+    version in their cache key, so changing the data only needs a new
+    version: every worker misses its cache at the next call and reads the
+    new data, and the registry cache shared with access rights and record
+    rules is left alone. The record is read through the ORM, so once per
+    transaction at most.
+
+    Versions come from a sequence and are never reused, not even after a
+    rollback, so values cached by a transaction that was rolled back can
+    never be served.
+    """
+
+    _name = 'user.notification.cache.stamp'
+    _description = 'User Notification Cache Stamp'
+    _log_access = False
+
+    settings_version = fields.Integer(string='Settings', default=0)
+    mute_version = fields.Integer(string='Mute Rules', default=0)
+    template_version = fields.Integer(string='Templates', default=0)
+    broadcast_version = fields.Integer(string='Broadcasts', default=0)
+
+    def init(self):
+        """Create the sequence the versions are taken from."""
+        self.env.cr.execute('CREATE SEQUENCE IF NOT EXISTS user_notification_cache_stamp_seq')
+
+    @api.model
+    def _get_stamp(self):
+        """Return the stamp record, as superuser."""
+        return self.env.ref('notification_bell.cache_stamp').sudo()
+
+    @api.model
+    def _get_version(self, group):
+        """Return the current version of a group of cached data.
+
+        Args:
+            group (str): ``settings``, ``mute``, ``template`` or ``broadcast``
+
+        Returns:
+            int: Version to put in the cache key
+        """
+        return self._get_stamp()[f'{group}_version']
+
+    @api.model
+    def _bump(self, group):
+        """Give a group of cached data a new version.
+
+        The new version is written in the current transaction, so other
+        workers only see it, and read the new data, once it commits.
+
+        Args:
+            group (str): ``settings``, ``mute``, ``template`` or ``broadcast``
+        """
+        stamp = self._get_stamp()
+        fname = f'{group}_version'
+        self.env.cr.execute(SQL(
+            "UPDATE user_notification_cache_stamp SET %s = nextval('user_notification_cache_stamp_seq') WHERE id = %s",
+            SQL.identifier(fname), stamp.id,
+        ))
+        stamp.invalidate_recordset([fname])
@@ -0,0 +1,180 @@
+"""User Notification Counter model.
+
+This module defines the User Notification Counter model which keeps a
+denormalized count of unread notifications for each user.
+"""
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class UserNotificationCounter(models.Model):
+    """User Notification Counter Model.
+
+    Holds the number of unread, active notifications of each user so that
+    the bell does not have to count them on every poll. Rows are only
+    changed through atomic SQL upserts that add a delta to the current
+    value, which keeps them correct under concurrent transactions.
+    """
+
+    _name = 'user.notification.counter'
+    _description = 'User Notification Counter'
+    _rec_name = 'user_id'
+    _log_access = False
+
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        ondelete='cascade'
+    )
+
+    unread_count = fields.Integer(
+        string='Unread Notifications',
+        default=0
+    )
+
+    version = fields.Integer(
+        string='Version',
+        default=0,
+        help='Increased every time a notification of the user is created or '
+             'changes state. Notifications store the version of their last change.'
+    )
+
+    _sql_constraints = [
+        ('user_uniq', 'UNIQUE(user_id)', 'A user can only have one notification counter!')
+    ]
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        """Apply unread count deltas and bump the version of several users.
+
+        Missing counters are created on the fly. Every user in ``deltas``
+        gets a new version, even when its delta is zero. Rows are upserted
+        in user order so that concurrent transactions lock them in the same
+        order and cannot deadlock; the lock is held until the end of the
+        transaction, so versions of a user are committed in order.
+
+        Args:
+            deltas (dict): Mapping of user ID to the change of its unread count
+
+        Returns:
+            dict: Mapping of user ID to its new version
+        """
+        rows = sorted((user_id, delta, 1) for user_id, delta in deltas.items() if user_id)
+        if not rows:
+            return {}
+        self.env.cr.execute("""
+            INSERT INTO user_notification_counter (user_id, unread_count, version)
+            VALUES %s
+            ON CONFLICT (user_id) DO UPDATE
+            SET unread_count = GREATEST(
+                    user_notification_counter.unread_count + EXCLUDED.unread_count, 0),
+                version = user_notification_counter.version + 1
+            RETURNING user_id, version
+        """ % ', '.join(['%s'] * len(rows)), rows)
+        versions = dict(self.env.cr.fetchall())
+        self.invalidate_model(['unread_count', 'version'])
+        return versions
+
+    @api.model
+    def _adjust_unread(self, deltas):
+        """Apply unread count deltas without bumping the versions.
+
+        Meant for counters that were already bumped by ``_apply_deltas``
+        in the current transaction, once the actual delta is known.
+
+        Args:
+            deltas (dict): Mapping of user ID to the change of its unread count
+        """
+        for user_id, delta in sorted(deltas.items()):
+            if delta:
+                self.env.cr.execute("""
+                    UPDATE user_notification_counter
+                       SET unread_count = GREATEST(unread_count + %s, 0)
+                     WHERE user_id = %s
+                """, [delta, user_id])
+        self.invalidate_model(['unread_count'])
+
+    @api.model
+    def _get_unread_count(self, user_id):
+        """Read the unread counter of a user.
+
+        Args:
+            user_id (int): The user ID to read the counter of
+
+        Returns:
+            int: Number of unread notifications
+        """
+        return self._get_counter(user_id)['unread_count']
+
+    @api.model
+    def _get_counter(self, user_id):
+        """Read the unread count and the version of a user.
+
+        Args:
+            user_id (int): The user ID to read the counter of
+
+        Returns:
+            dict: ``unread_count`` and ``version`` of the user
+        """
+        self.env.cr.execute(
+            'SELECT unread_count, version FROM user_notification_counter WHERE user_id = %s',
+            [user_id],
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return {'unread_count': 0, 'version': 0}
+        return {'unread_count': max(row[0], 0), 'version': row[1]}
+
+    @api.model
+    def _recompute_counters(self, user_ids=None):
+        """Recompute unread counters from the notification table.
+
+        Fixes counters that drifted from the actual number of unread,
+        active notifications, e.g. after rows were changed with raw SQL.
+
+        Args:
+            user_ids (list, optional): Only repair the counters of these users.
+                If not provided, all counters are recomputed.
+
+        Returns:
+            int: Number of counters that were created or corrected
+        """
+        user_filter = ''
+        params = {}
+        if user_ids:
+            user_filter = 'AND user_id IN %(user_ids)s'
+            params['user_ids'] = tuple(user_ids)
+        self.env.cr.execute("""
+            WITH actual AS (
+                SELECT user_id, count(*) AS unread_count
+                  FROM user_notification
+                 WHERE state = 'unread' AND active {user_filter}
+              GROUP BY user_id
+            )
+            INSERT INTO user_notification_counter (user_id, unread_count, version)
+            SELECT user_id, unread_count, 1 FROM actual
+             UNION ALL
+            SELECT user_id, 0, 1
+              FROM user_notification_counter counter
+             WHERE NOT EXISTS (SELECT 1 FROM actual WHERE actual.user_id = counter.user_id)
+                   {user_filter}
+            ON CONFLICT (user_id) DO UPDATE
+            SET unread_count = EXCLUDED.unread_count,
+                version = user_notification_counter.version + 1
+            WHERE user_notification_counter.unread_count <> EXCLUDED.unread_count
+            RETURNING user_id
+        """.format(user_filter=user_filter), params)
+        repaired = len(self.env.cr.fetchall())
+        self.invalidate_model(['unread_count', 'version'])
+        _logger.info("Recomputed notification counters: %s created or corrected", repaired)
+        return repaired
+
+    @api.model
+    def _cron_recompute_counters(self):
+        """Scheduled action repairing drifted unread counters."""
+        self._recompute_counters()
@@ -0,0 +1,142 @@
+"""User Notification Mute Rule model.
+
+This module defines the User Notification Mute Rule model which lets
+users silence notifications from given senders, documents or types.
+"""
+
+from collections import defaultdict
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import ValidationError
+
+
+class UserNotificationMute(models.Model):
+    """User Notification Mute Rule Model.
+
+    A rule mutes the notifications of its user that match all of its
+    criteria. Muted notifications are dropped before they are inserted,
+    using an index of all the rules compiled once per worker and cached
+    until rules change.
+    """
+
+    _name = 'user.notification.mute'
+    _description = 'User Notification Mute Rule'
+
+    settings_id = fields.Many2one(
+        'user.notification.settings',
+        string='Settings',
+        required=True,
+        ondelete='cascade'
+    )
+    user_id = fields.Many2one(
+        related='settings_id.user_id',
+        string='User',
+        store=True,
+        index=True
+    )
+    sender_id = fields.Many2one(
+        'res.users',
+        string='From User',
+        ondelete='cascade',
+        help='Mute the notifications sent by this user'
+    )
+    res_model = fields.Char(
+        string='Related Model',
+        help='Mute the notifications about records of this model, e.g. purchase.order'
+    )
+    notification_type = fields.Selection(
+        [
+            ('info', 'Information'),
+            ('success', 'Success'),
+            ('warning', 'Warning'),
+            ('danger', 'Danger')
+        ],
+        string='Type',
+        help='Mute the notifications of this type'
+    )
+
+    @api.constrains('sender_id', 'res_model', 'notification_type')
+    def _check_criteria(self):
+        for rule in self:
+            if not (rule.sender_id or rule.res_model or rule.notification_type):
+                raise ValidationError(_("A mute rule needs a sender, a model or a type."))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to expire the rule index."""
+        records = super(UserNotificationMute, self).create(vals_list)
+        self.env['user.notification.cache.stamp']._bump('mute')
+        return records
+
+    def write(self, vals):
+        """Override write to expire the rule index."""
+        result = super(UserNotificationMute, self).write(vals)
+        self.env['user.notification.cache.stamp']._bump('mute')
+        return result
+
+    def unlink(self):
+        """Override unlink to expire the rule index."""
+        result = super(UserNotificationMute, self).unlink()
+        self.env['user.notification.cache.stamp']._bump('mute')
+        return result
+
+    @api.model
+    @tools.ormcache("self.env['user.notification.cache.stamp']._get_version('mute')")
+    def _get_mute_index(self):
+        """Compile all the mute rules into an index keyed by recipient.
+
+        Single-criterion rules, the common case, become sets so that a
+        notification is checked with a few lookups; rules combining
+        several criteria are kept as tuples.
+
+        Returns:
+            dict: Mapping of user ID to a ``(senders, models, types,
+                combined)`` tuple, ``combined`` holding
+                ``(sender_id, res_model, notification_type)`` tuples with
+                None for unset criteria
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT user_id, sender_id, res_model, notification_type
+              FROM user_notification_mute
+             WHERE user_id IS NOT NULL
+        """)
+        rules = defaultdict(lambda: (set(), set(), set(), []))
+        for user_id, sender_id, res_model, notification_type in self.env.cr.fetchall():
+            senders, res_models, types, combined = rules[user_id]
+            criteria = (sender_id, res_model or None, notification_type or None)
+            if sum(criterion is not None for criterion in criteria) > 1:
+                combined.append(criteria)
+            elif sender_id:
+                senders.add(sender_id)
+            elif res_model:
+                res_models.add(res_model)
+            elif notification_type:
+                types.add(notification_type)
+        return {
+            user_id: (frozenset(senders), frozenset(res_models), frozenset(types), tuple(combined))
+            for user_id, (senders, res_models, types, combined) in rules.items()
+        }
+
+    @api.model
+    def _is_muted(self, rules, sender_id, res_model, notification_type):
+        """Check a notification against the compiled rules of its recipient.
+
+        Args:
+            rules (tuple): Entry of the recipient in ``_get_mute_index``
+            sender_id (int): ID of the sender
+            res_model (str): Related model
+            notification_type (str): Type of the notification
+
+        Returns:
+            bool: Whether the notification is muted
+        """
+        senders, res_models, types, combined = rules
+        if sender_id in senders or res_model in res_models or notification_type in types:
+            return True
+        return any(
+            (rule_sender is None or rule_sender == sender_id)
+            and (rule_model is None or rule_model == res_model)
+            and (rule_type is None or rule_type == notification_type)
+            for rule_sender, rule_model, rule_type in combined
+        )
@@ -0,0 +1,205 @@
+"""User Notification Queue model.
+
+This module defines the User Notification Queue model which lets
+business code hand notifications over to a scheduled action instead of
+creating them inside its own transaction.
+"""
+
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import create_index
+
+_logger = logging.getLogger(__name__)
+
+
+class UserNotificationQueue(models.Model):
+    """User Notification Queue Model.
+
+    Each row holds the values of one notification waiting to be created.
+    Rows are drained in batches by scheduled actions that lock them with
+    ``FOR UPDATE SKIP LOCKED``, so several cron workers can drain the queue
+    in parallel without picking the same rows.
+    """
+
+    _name = 'user.notification.queue'
+    _description = 'User Notification Queue'
+    _order = 'priority, id'
+
+    _max_attempts = 5
+
+    payload = fields.Text(
+        string='Values',
+        required=True,
+        help='JSON encoded values of the notification to create'
+    )
+    priority = fields.Selection(
+        [
+            ('0', 'High'),
+            ('1', 'Normal'),
+            ('2', 'Low')
+        ],
+        string='Priority',
+        default='1',
+        required=True,
+    )
+    state = fields.Selection(
+        [
+            ('pending', 'Pending'),
+            ('failed', 'Failed')
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+    )
+    attempts = fields.Integer(string='Attempts', default=0)
+    next_attempt = fields.Datetime(
+        string='Next Attempt',
+        default=fields.Datetime.now,
+        required=True,
+    )
+    last_error = fields.Text(string='Last Error')
+
+    def init(self):
+        """Index the rows the drainer looks for."""
+        create_index(
+            self.env.cr,
+            'user_notification_queue_pending_idx',
+            self._table,
+            ['priority', 'id'],
+            where="state = 'pending'",
+        )
+
+    @api.model
+    def enqueue(self, vals_list, priority='1', delay=0):
+        """Queue notifications to be created by the drainer.
+
+        Only the queue rows are written in the caller's transaction; the
+        notifications and their bus messages are created later by the
+        scheduled action of the priority's lane, which is triggered when
+        the transaction commits.
+
+        The caller must be allowed to create the notifications, record
+        rules included, as the drainer creates them as superuser. Defaults
+        such as the sender and the company are resolved now, in the
+        caller's environment, so the drainer does not fill them with its
+        own. The queue rows themselves are written as superuser.
+
+        Args:
+            vals_list (list): Values of the notifications to create
+            priority (str, optional): '0' (high), '1' (normal) or '2' (low)
+            delay (int, optional): Seconds to wait before delivering them
+
+        Returns:
+            UserNotificationQueue: Created queue rows
+        """
+        Notification = self.env['user.notification']
+        vals_list = [Notification._add_missing_default_values(vals) for vals in vals_list]
+        Notification._check_create_rules(vals_list)
+        next_attempt = fields.Datetime.now() + timedelta(seconds=delay)
+        records = self.sudo().create([{
+            'payload': json.dumps(vals, default=str),
+            'priority': priority,
+            'next_attempt': next_attempt,
+        } for vals in vals_list])
+        cron_xml_id = ('notification_bell.ir_cron_drain_notification_queue_high'
+                       if priority == '0' else
+                       'notification_bell.ir_cron_drain_notification_queue')
+        cron = self.env.ref(cron_xml_id, raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(next_attempt)
+        return records
+
+    @api.model
+    def _cron_drain(self, priorities=None, batch_size=500, max_batches=100):
+        """Scheduled action turning queued rows into notifications.
+
+        Rows are taken by batches of ``batch_size`` in priority order and
+        locked with ``FOR UPDATE SKIP LOCKED``. Each batch is committed on
+        its own so locks are held briefly.
+
+        Args:
+            priorities (list, optional): Priorities of the lane to drain.
+                If not provided, all priorities are drained.
+            batch_size (int, optional): Number of rows per batch
+            max_batches (int, optional): Maximum number of batches per run
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        priority_filter = 'AND priority IN %(priorities)s' if priorities else ''
+        for _batch in range(max_batches):
+            self.env.cr.execute("""
+                SELECT id, payload, attempts
+                  FROM user_notification_queue
+                 WHERE state = 'pending'
+                   AND next_attempt <= %(now)s
+                       {priority_filter}
+              ORDER BY priority, id
+                 LIMIT %(limit)s
+                   FOR UPDATE SKIP LOCKED
+            """.format(priority_filter=priority_filter), {
+                'now': fields.Datetime.now(),
+                'priorities': tuple(priorities or ()),
+                'limit': batch_size,
+            })
+            rows = self.env.cr.fetchall()
+            if not rows:
+                break
+            self._deliver(rows)
+            if auto_commit:
+                self.env.cr.commit()
+            if len(rows) < batch_size:
+                break
+
+    @api.model
+    def _deliver(self, rows):
+        """Create the notifications of a batch of queued rows.
+
+        The whole batch is created at once. If that fails, the rows are
+        retried one by one so that a single bad row does not hold back the
+        others; failing rows are rescheduled with an exponential backoff
+        and marked as failed after ``_max_attempts`` attempts.
+
+        Args:
+            rows (list): ``(id, payload, attempts)`` tuples of locked rows
+        """
+        Notification = self.env['user.notification'].sudo()
+        try:
+            with self.env.cr.savepoint():
+                Notification.create([json.loads(payload) for _id, payload, _attempts in rows])
+            delivered = [queue_id for queue_id, _payload, _attempts in rows]
+        except Exception:
+            delivered = []
+            for queue_id, payload, attempts in rows:
+                try:
+                    with self.env.cr.savepoint():
+                        Notification.create([json.loads(payload)])
+                    delivered.append(queue_id)
+                except Exception as error:
+                    _logger.warning("Queued notification %s could not be delivered: %s", queue_id, error)
+                    attempts += 1
+                    self.env.cr.execute("""
+                        UPDATE user_notification_queue
+                           SET attempts = %s, next_attempt = %s, state = %s, last_error = %s
+                         WHERE id = %s
+                    """, [
+                        attempts,
+                        fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+                        'failed' if attempts >= self._max_attempts else 'pending',
+                        str(error),
+                        queue_id,
+                    ])
+        if delivered:
+            self.env.cr.execute('DELETE FROM user_notification_queue WHERE id IN %s', [tuple(delivered)])
+        self.invalidate_model()
+
+    def action_retry(self):
+        """Put failed rows back in the queue."""
+        self.write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        return True
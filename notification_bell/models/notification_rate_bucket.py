@@ -0,0 +1,102 @@
+"""User Notification Rate Bucket model.
+
+This module defines the User Notification Rate Bucket model which holds
+the token buckets limiting how many notifications a user can receive or
+send in a short time.
+"""
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class UserNotificationRateBucket(models.Model):
+    """User Notification Rate Bucket Model.
+
+    Each row is the token bucket of one recipient or sender, keyed by
+    ``recipient:<user_id>`` or ``sender:<user_id>``. Buckets live in the
+    database so that all the workers share them, and are only changed
+    through atomic upserts in ``_consume``.
+    """
+
+    _name = 'user.notification.rate.bucket'
+    _description = 'User Notification Rate Bucket'
+    _rec_name = 'key'
+    _log_access = False
+
+    key = fields.Char(string='Key', required=True)
+    tokens = fields.Float(string='Tokens', help='Notifications that can still be sent right away')
+    capacity = fields.Float(string='Capacity', help='Size of the bucket, i.e. the allowed burst')
+    rate = fields.Float(string='Refill Rate', help='Tokens added back per second')
+    requested = fields.Integer(string='Last Requested')
+    granted = fields.Integer(string='Last Granted')
+    updated = fields.Datetime(string='Last Update')
+
+    _sql_constraints = [
+        ('key_uniq', 'UNIQUE(key)', 'A rate limit key can only have one bucket!')
+    ]
+
+    @api.model
+    def _consume(self, requests):
+        """Take tokens from several buckets in a single statement.
+
+        Missing buckets are created full. Existing ones are first refilled
+        with the tokens earned since their last update, up to their
+        capacity, then give as many of the requested tokens as they can.
+        Rows are upserted in key order so that concurrent transactions
+        cannot deadlock.
+
+        The upsert runs in the sender's transaction: tokens are given back
+        if it rolls back, and no other connection is used. Concurrent sends
+        to one recipient or from one sender wait for each other's commit on
+        the bucket row, and serialization failures between them are retried
+        with the whole request by the server.
+
+        Args:
+            requests (dict): Mapping of bucket key to a
+                ``(requested, capacity, rate)`` tuple, ``rate`` being in
+                tokens per second
+
+        Returns:
+            dict: Mapping of bucket key to the number of granted tokens
+        """
+        if not requests:
+            return {}
+        rows = sorted(
+            (key, requested, float(capacity), float(rate))
+            for key, (requested, capacity, rate) in requests.items()
+        )
+        self.env.cr.execute("""
+            INSERT INTO user_notification_rate_bucket AS bucket
+                        (key, requested, granted, tokens, capacity, rate, updated)
+                 SELECT key, requested,
+                        LEAST(requested, FLOOR(capacity)),
+                        capacity - LEAST(requested, FLOOR(capacity)),
+                        capacity, rate, %s
+                   FROM (VALUES {rows}) AS request(key, requested, capacity, rate)
+               ORDER BY key
+            ON CONFLICT (key) DO UPDATE
+            SET requested = EXCLUDED.requested,
+                granted = LEAST(EXCLUDED.requested, FLOOR(LEAST(EXCLUDED.capacity,
+                    bucket.tokens + EXCLUDED.rate * GREATEST(EXTRACT(EPOCH FROM EXCLUDED.updated - bucket.updated), 0)))),
+                tokens = LEAST(EXCLUDED.capacity,
+                    bucket.tokens + EXCLUDED.rate * GREATEST(EXTRACT(EPOCH FROM EXCLUDED.updated - bucket.updated), 0))
+                    - LEAST(EXCLUDED.requested, FLOOR(LEAST(EXCLUDED.capacity,
+                    bucket.tokens + EXCLUDED.rate * GREATEST(EXTRACT(EPOCH FROM EXCLUDED.updated - bucket.updated), 0)))),
+                capacity = EXCLUDED.capacity,
+                rate = EXCLUDED.rate,
+                updated = GREATEST(bucket.updated, EXCLUDED.updated)
+            RETURNING key, granted
+        """.format(rows=', '.join(['(%s, %s::int, %s::float, %s::float)'] * len(rows))),
+            [fields.Datetime.now()] + [value for row in rows for value in row])
+        granted = dict(self.env.cr.fetchall())
+        self.invalidate_model()
+        return granted
+
+    @api.autovacuum
+    def _gc_buckets(self):
+        """Delete buckets that were not used for a day; they are full again anyway."""
+        self.env.cr.execute(
+            'DELETE FROM user_notification_rate_bucket WHERE updated < %s',
+            [fields.Datetime.now() - timedelta(days=1)],
+        )
@@ -0,0 +1,134 @@
+"""User Notification Template model.
+
+This module defines the User Notification Template model which holds
+parameterized titles and bodies shared by many notifications.
+"""
+
+import functools
+import string
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import ValidationError
+
+
+@functools.lru_cache(maxsize=512)
+def compile_template(text):
+    """Split a template text into literal parts and placeholder names.
+
+    Placeholders use the ``{name}`` syntax; format specs and conversions
+    are ignored and ``{{`` / ``}}`` stand for literal braces. Compiled
+    texts are kept in a least recently used cache, keyed by the text
+    itself, so editing a template never serves a stale compilation.
+
+    Args:
+        text (str): Template text
+
+    Returns:
+        tuple: ``(literal, placeholder)`` pairs, placeholder being None
+            for a trailing literal
+    """
+    return tuple(
+        (literal, placeholder)
+        for literal, placeholder, _spec, _conversion in string.Formatter().parse(text or '')
+    )
+
+
+def render_template(text, params):
+    """Render a template text with the given parameters.
+
+    Args:
+        text (str): Template text
+        params (dict): Values of the placeholders; missing ones render empty
+
+    Returns:
+        str: Rendered text
+    """
+    return ''.join(
+        literal + (str(params.get(placeholder, '')) if placeholder is not None else '')
+        for literal, placeholder in compile_template(text)
+    )
+
+
+class UserNotificationTemplate(models.Model):
+    """User Notification Template Model.
+
+    Notifications created from a template only store a reference to it
+    and their own parameters, instead of a full copy of the title and
+    message, and are rendered when they are read.
+    """
+
+    _name = 'user.notification.template'
+    _description = 'User Notification Template'
+
+    name = fields.Char(string='Name', required=True)
+    title = fields.Char(
+        string='Title',
+        required=True,
+        help='Placeholders such as {partner} are replaced by the notification parameters'
+    )
+    body = fields.Text(
+        string='Message',
+        required=True,
+        help='Placeholders such as {partner} are replaced by the notification parameters'
+    )
+    active = fields.Boolean(string='Active', default=True)
+
+    @api.constrains('title', 'body')
+    def _check_placeholders(self):
+        for template in self:
+            try:
+                compile_template(template.title)
+                compile_template(template.body)
+            except ValueError as error:
+                raise ValidationError(_("Invalid placeholder in template %(name)s: %(error)s",
+                                        name=template.name, error=error))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to expire the template cache."""
+        records = super(UserNotificationTemplate, self).create(vals_list)
+        self.env['user.notification.cache.stamp']._bump('template')
+        return records
+
+    def write(self, vals):
+        """Override write to expire the template cache."""
+        result = super(UserNotificationTemplate, self).write(vals)
+        self.env['user.notification.cache.stamp']._bump('template')
+        return result
+
+    def unlink(self):
+        """Override unlink to expire the template cache."""
+        result = super(UserNotificationTemplate, self).unlink()
+        self.env['user.notification.cache.stamp']._bump('template')
+        return result
+
+    @tools.ormcache('template_id', "self.env['user.notification.cache.stamp']._get_version('template')")
+    def _get_texts(self, template_id):
+        """Read the title and body of a template, from the cache.
+
+        Args:
+            template_id (int): ID of the template
+
+        Returns:
+            tuple: Title and body of the template
+        """
+        self.flush_model(['title', 'body'])
+        self.env.cr.execute(
+            'SELECT title, body FROM user_notification_template WHERE id = %s',
+            [template_id],
+        )
+        return self.env.cr.fetchone() or ('', '')
+
+    @api.model
+    def _render(self, template_id, params):
+        """Render the title and body of a template.
+
+        Args:
+            template_id (int): ID of the template
+            params (dict): Values of the placeholders
+
+        Returns:
+            tuple: Rendered title and body
+        """
+        title, body = self._get_texts(template_id)
+        return render_template(title, params), render_template(body, params)
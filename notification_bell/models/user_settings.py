@@ -4,7 +4,15 @@ This module defines the User Notification Settings model which handles
 notification preferences for users.
 """
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
+
+DELIVERY_MODES = [
+    ('realtime', 'Real-time'),
+    ('hourly', 'Hourly digest'),
+    ('daily', 'Daily digest'),
+]
+
+NOTIFICATION_TYPES = ['info', 'success', 'warning', 'danger']
 
 class UserNotificationSettings(models.Model):
     """User Notification Settings Model.
@@ -31,14 +39,79 @@ class UserNotificationSettings(models.Model):
         help='Maximum number of notifications to display in the dropdown'
     )
     
+    delivery_mode = fields.Selection(
+        DELIVERY_MODES,
+        string='Delivery',
+        default='realtime',
+        required=True,
+        help='Real-time notifications pop up as soon as they are sent. Digest '
+             'notifications are gathered silently and announced by a single '
+             'summary notification every hour or every day.'
+    )
+    
+    info_delivery_mode = fields.Selection(
+        DELIVERY_MODES,
+        string='Information',
+        help='Delivery of information notifications, if different from the default'
+    )
+    
+    success_delivery_mode = fields.Selection(
+        DELIVERY_MODES,
+        string='Success',
+        help='Delivery of success notifications, if different from the default'
+    )
+    
+    warning_delivery_mode = fields.Selection(
+        DELIVERY_MODES,
+        string='Warning',
+        help='Delivery of warning notifications, if different from the default'
+    )
+    
+    danger_delivery_mode = fields.Selection(
+        DELIVERY_MODES,
+        string='Danger',
+        help='Delivery of danger notifications, if different from the default'
+    )
+    
+    mute_rule_ids = fields.One2many(
+        'user.notification.mute',
+        'settings_id',
+        string='Muted',
+        help='Notifications matching one of these rules are not delivered'
+    )
+    
     _sql_constraints = [
         ('user_uniq', 'UNIQUE(user_id)', 'A user can only have one notification settings record!')
     ]
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to expire the settings cache."""
+        records = super(UserNotificationSettings, self).create(vals_list)
+        self.env['user.notification.cache.stamp']._bump('settings')
+        return records
+    
+    def write(self, vals):
+        """Override write to expire the settings cache."""
+        result = super(UserNotificationSettings, self).write(vals)
+        self.env['user.notification.cache.stamp']._bump('settings')
+        return result
+    
+    def unlink(self):
+        """Override unlink to expire the settings cache."""
+        result = super(UserNotificationSettings, self).unlink()
+        self.env['user.notification.cache.stamp']._bump('settings')
+        return result
+    
     @api.model
     def get_user_settings(self, user_id=None):
         """Get settings for a specific user or create default if not exists.
         
+        Missing settings are created with an upsert on the ``user_uniq``
+        constraint, so concurrent first requests cannot collide. Creating
+        them leaves the cache alone: it already holds the default values
+        they are created with.
+        
         Args:
             user_id (int, optional): The user ID to get settings for.
                 If not provided, uses the current user.
@@ -46,11 +119,104 @@ class UserNotificationSettings(models.Model):
         Returns:
             UserNotificationSettings: User notification settings record
         """
-        if not user_id:
-            user_id = self.env.user.id
-            
-        settings = self.search([('user_id', '=', user_id)], limit=1)
-        if not settings:
-            settings = self.create({'user_id': user_id})
+        user_id = user_id or self.env.user.id
+        settings_id = self.get_user_settings_values(user_id)['id']
+        if settings_id:
+            return self.browse(settings_id)
+        now = self.env.cr.now()
+        self.env.cr.execute("""
+            INSERT INTO user_notification_settings
+                        (user_id, notifications_limit, delivery_mode,
+                         create_uid, create_date, write_uid, write_date)
+                 VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+              RETURNING id
+        """, [user_id, self._fields['notifications_limit'].default(self),
+              self._fields['delivery_mode'].default(self),
+              self.env.uid, now, self.env.uid, now])
+        return self.browse(self.env.cr.fetchone()[0])
+    
+    @api.model
+    def get_user_settings_values(self, user_id=None):
+        """Get the settings of a user as a dictionary, from the cache.
+        
+        This is what the bell's hot path uses: once cached, reading the
+        settings does not touch the database. The cache is keyed on the
+        ``settings`` version of ``user.notification.cache.stamp``, bumped
+        whenever settings are created, written or deleted.
+        
+        Args:
+            user_id (int, optional): The user ID to get settings for.
+                If not provided, uses the current user.
+                
+        Returns:
+            dict: Settings values, including the record ``id``, False for
+                users without settings
+        """
+        return dict(self._get_settings_values(user_id or self.env.user.id))
+    
+    @tools.ormcache('user_id', "self.env['user.notification.cache.stamp']._get_version('settings')")
+    def _get_settings_values(self, user_id):
+        """Read the settings of a user.
+        
+        Only reads, so that a rolled back transaction can never leave the
+        cache pointing to a row that does not exist. Users without
+        settings get the default values; ``get_user_settings`` creates
+        their record when it is actually needed.
+        
+        Args:
+            user_id (int): The user ID to get settings for
             
-        return settings 
\ No newline at end of file
+        Returns:
+            dict: Settings values, including the record ``id``
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT id, notifications_limit, delivery_mode
+              FROM user_notification_settings
+             WHERE user_id = %s
+        """, [user_id])
+        row = self.env.cr.dictfetchone()
+        if not row:
+            row = {
+                'id': False,
+                'notifications_limit': self._fields['notifications_limit'].default(self),
+                'delivery_mode': self._fields['delivery_mode'].default(self),
+            }
+        return row
+    
+    @api.model
+    @tools.ormcache("self.env['user.notification.cache.stamp']._get_version('settings')")
+    def _get_digest_periods(self):
+        """Map the users receiving digests to their digest period per type.
+        
+        This is read for every notification sent, so it is cached for all
+        users at once and only lists the users with at least one digest
+        mode; everybody else receives notifications in real time. The
+        cache expires whenever settings change.
+        
+        Returns:
+            dict: Mapping of user ID to a mapping of notification type to
+                ``'hourly'``, ``'daily'`` or False for real-time
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT user_id, delivery_mode, {columns}
+              FROM user_notification_settings
+             WHERE delivery_mode != 'realtime' OR {overridden}
+        """.format(
+            columns=', '.join(f'{ntype}_delivery_mode' for ntype in NOTIFICATION_TYPES),
+            overridden=' OR '.join(f"{ntype}_delivery_mode != 'realtime'" for ntype in NOTIFICATION_TYPES),
+        ))
+        periods = {}
+        for row in self.env.cr.dictfetchall():
+            modes = {
+                ntype: row[f'{ntype}_delivery_mode'] or row['delivery_mode']
+                for ntype in NOTIFICATION_TYPES
+            }
+            if any(mode != 'realtime' for mode in modes.values()):
+                periods[row['user_id']] = {
+                    ntype: mode if mode != 'realtime' else False
+                    for ntype, mode in modes.items()
+                }
+        return periods
@@ -24,28 +24,28 @@ export class NotificationBell extends Component {
       notifications: [],
       unreadNotifications: [],
       unreadCount: 0,
+      nextCursor: false,
+      version: 0,
+      etag: false,
+      broadcastStamp: false,
+      limit: 10,
+      pageCount: 1,
       isOpen: false,
     });
 
     onWillStart(async () => {
       await this.fetchNotifications();
-      await this.fetchUnreadCount();
     });
 
     onMounted(() => {
       this._registerBusEvents();
-      this._updateInterval = browser.setInterval(
-        this.fetchUnreadCount.bind(this),
-        60000
-      );
 
       document.addEventListener("click", this._handleClickOutside.bind(this));
     });
 
     onWillUnmount(() => {
-      if (this._updateInterval) {
-        browser.clearInterval(this._updateInterval);
-      }
+      this._stopPolling();
+      browser.clearTimeout(this._broadcastTimeout);
 
       document.removeEventListener(
         "click",
@@ -55,51 +55,235 @@ export class NotificationBell extends Component {
   }
 
   /**
-   * 
+   * Every message on the channel carries the unread count and version of
+   * the user, so the count is never polled while the bus is connected.
+   * Polling only runs as a fallback while the bus is disconnected.
+   *
    * @private
    */
   _registerBusEvents() {
     const channel = `notification_bell_${session.user_id}`;
     this.busService.addChannel(channel);
+    this.busService.addChannel("notification_bell_broadcast");
     this.busService.addEventListener(
       "notification",
       ({ detail: notifications }) => {
-        const notificationBellNotifs = notifications.filter(
-          (notif) => notif.type === "new_notification"
+        if (notifications.some((notif) => notif.type === "new_broadcast")) {
+          this._scheduleBroadcastFetch();
+        }
+        const messages = notifications.filter(
+          (notif) =>
+            notif.type === "new_notification" ||
+            notif.type === "notification_state"
         );
+        if (!messages.length) {
+          return;
+        }
 
-        if (notificationBellNotifs.length) {
-          this.fetchUnreadCount();
-
-          if (this.state.isOpen) {
-            this.fetchNotifications();
-          }
+        const latest = messages[messages.length - 1].payload;
+        if (latest.version <= this.state.version) {
+          return;
+        }
+        this.state.unreadCount = latest.unread_count || 0;
+        if (
+          this.state.isOpen ||
+          messages.some((notif) => notif.type === "new_notification")
+        ) {
+          this.syncNotifications();
         }
       }
     );
+    this.busService.addEventListener("disconnect", () => this._startPolling());
+    this.busService.addEventListener("reconnect", () => {
+      this._stopPolling();
+      this.fetchNotifications();
+    });
+  }
+
+  /**
+   * A broadcast reaches every open tab at once: spread the reloads over a
+   * few seconds so they do not all hit the server together.
+   *
+   * @private
+   */
+  _scheduleBroadcastFetch() {
+    if (!this._broadcastTimeout) {
+      this._broadcastTimeout = browser.setTimeout(() => {
+        this._broadcastTimeout = null;
+        this.fetchNotifications();
+      }, Math.random() * 10000);
+    }
+  }
+
+  /**
+   * @private
+   */
+  _startPolling() {
+    if (!this._updateInterval) {
+      this._updateInterval = browser.setInterval(
+        this.fetchUnreadCount.bind(this),
+        60000
+      );
+    }
   }
 
+  /**
+   * @private
+   */
+  _stopPolling() {
+    if (this._updateInterval) {
+      browser.clearInterval(this._updateInterval);
+      this._updateInterval = null;
+    }
+  }
+
+  /**
+   * Reload the first page, unless the server answers that nothing changed
+   * since the version tag of the current list.
+   */
   async fetchNotifications() {
     try {
       const result = await this._performRpc(
-        "/notification_bell/get_notifications"
+        "/notification_bell/get_notifications",
+        { etag: this.state.etag }
       );
+      if (result.not_modified) {
+        return;
+      }
       this.state.notifications = result.notifications || [];
       this.state.unreadNotifications = this.state.notifications.filter(
         (n) => n.state === "unread"
       );
       this.state.unreadCount = result.unread_count || 0;
+      this.state.nextCursor = result.next_cursor || false;
+      this.state.version = result.version || 0;
+      this.state.etag = result.etag || false;
+      this.state.broadcastStamp = result.broadcast_stamp || false;
+      this.state.limit = (result.settings || {}).notifications_limit || 10;
+      this.state.pageCount = 1;
     } catch (error) {
       console.error("Error fetching notifications:", error);
     }
   }
 
-  async fetchUnreadCount() {
+  /**
+   * Apply only what changed since the last known version instead of
+   * downloading the whole list again.
+   */
+  async syncNotifications() {
+    try {
+      const result = await this._performRpc("/notification_bell/sync", {
+        since_version: this.state.version,
+        broadcast_stamp: this.state.broadcastStamp,
+      });
+      await this._applyChanges(result);
+    } catch (error) {
+      console.error("Error syncing notifications:", error);
+    }
+  }
+
+  /**
+   * Merge the result of a sync into the state.
+   *
+   * Changed rows that are not displayed yet are only added when they fall
+   * within the loaded pages, i.e. newer than the oldest displayed row or
+   * when every page is loaded: an old notification restored on another
+   * device must not jump to the top. The list is kept sorted by date and
+   * cut back to the loaded pages, moving the cursor of the next page
+   * accordingly.
+   */
+  async _applyChanges(result) {
+    if (result.reset) {
+      await this.fetchNotifications();
+      return;
+    }
+
+    const dismissedIds = new Set(result.dismissed_ids || []);
+    const notifications = this.state.notifications.filter(
+      (n) => !dismissedIds.has(n.id)
+    );
+    const oldest = notifications[notifications.length - 1];
+    for (const changed of result.notifications || []) {
+      const existing = notifications.find((n) => n.id === changed.id);
+      if (existing) {
+        Object.assign(existing, changed);
+      } else if (
+        !this.state.nextCursor ||
+        !oldest ||
+        this._compareNotifications(changed, oldest) < 0
+      ) {
+        notifications.push(changed);
+      }
+    }
+    notifications.sort((a, b) => this._compareNotifications(a, b));
+
+    const size = this.state.limit * this.state.pageCount;
+    if (notifications.length > size) {
+      notifications.length = size;
+      const last = notifications.findLast((n) => n.cursor);
+      this.state.nextCursor = last ? last.cursor : this.state.nextCursor;
+    }
+    this.state.notifications = notifications;
+    this.state.unreadNotifications = this.state.notifications.filter(
+      (n) => n.state === "unread"
+    );
+    this.state.unreadCount = result.unread_count || 0;
+    this.state.version = result.version || 0;
+    this.state.etag = result.etag || false;
+    this.state.broadcastStamp = result.broadcast_stamp || false;
+  }
+
+  /**
+   * Order of the bell: newest first, like the ``(create_date, id)``
+   * cursor of the server.
+   *
+   * @private
+   */
+  _compareNotifications(a, b) {
+    return (
+      (b.create_date || "").localeCompare(a.create_date || "") || b.id - a.id
+    );
+  }
+
+  async loadMoreNotifications(ev) {
+    ev.preventDefault();
+    ev.stopPropagation();
+
+    if (!this.state.nextCursor) {
+      return;
+    }
+
     try {
       const result = await this._performRpc(
-        "/notification_bell/get_unread_count"
+        "/notification_bell/get_notifications",
+        { cursor: this.state.nextCursor }
+      );
+      this.state.notifications.push(...(result.notifications || []));
+      this.state.unreadNotifications = this.state.notifications.filter(
+        (n) => n.state === "unread"
       );
       this.state.unreadCount = result.unread_count || 0;
+      this.state.nextCursor = result.next_cursor || false;
+      this.state.pageCount += 1;
+    } catch (error) {
+      console.error("Error loading more notifications:", error);
+    }
+  }
+
+  /**
+   * Polling fallback: a single version lookup on the server while nothing
+   * changed, a reload of the list otherwise. The version tag also covers
+   * broadcasts, which a sync does not return.
+   */
+  async fetchUnreadCount() {
+    try {
+      const result = await this._performRpc(
+        "/notification_bell/get_unread_count",
+        { etag: this.state.etag }
+      );
+      if (!result.not_modified) {
+        await this.fetchNotifications();
+      }
     } catch (error) {
       console.error("Error fetching unread count:", error);
     }
@@ -112,6 +296,19 @@ export class NotificationBell extends Component {
     return this.orm.call("user.notification", "json_rpc", [route, params]);
   }
 
+  /**
+   * Run several routes in a single round trip and transaction.
+   *
+   * @private
+   * @param {Array<[string, Object]>} calls route and params pairs
+   * @returns {Promise<{results: Array, unread_count: number}>}
+   */
+  async _performBatch(calls) {
+    return this._performRpc("/notification_bell/batch", {
+      calls: calls.map(([route, params]) => ({ route, params })),
+    });
+  }
+
   toggleDropdown(ev) {
     if (ev) {
       ev.preventDefault();
@@ -135,23 +332,18 @@ export class NotificationBell extends Component {
     const notificationId = parseInt(ev.currentTarget.dataset.notificationId);
 
     try {
-      const result = await this.orm.call(
-        "user.notification",
-        "action_open_record",
-        [notificationId]
-      );
-
-      if (result && typeof result === "object" && result.type) {
-        await this.action.doAction(result);
-      }
-
-      this.fetchUnreadCount();
+      const { results } = await this._performBatch([
+        ["/notification_bell/open_notification", { notification_id: notificationId }],
+        ["/notification_bell/sync", {
+          since_version: this.state.version,
+          broadcast_stamp: this.state.broadcastStamp,
+        }],
+      ]);
+      await this._applyChanges(results[1]);
 
-      const notification = this.state.notifications.find(
-        (n) => n.id === notificationId
-      );
-      if (notification) {
-        notification.state = "read";
+      const action = results[0].action;
+      if (action && typeof action === "object" && action.type) {
+        await this.action.doAction(action);
       }
     } catch (error) {
       console.error("Error opening notification:", error);
@@ -197,22 +389,14 @@ export class NotificationBell extends Component {
     const notificationId = parseInt(ev.currentTarget.dataset.notificationId);
 
     try {
-      await this.orm.call("user.notification", "mark_as_read", [
-        [notificationId],
+      const { results } = await this._performBatch([
+        ["/notification_bell/mark_as_read", { notification_id: notificationId }],
+        ["/notification_bell/sync", {
+          since_version: this.state.version,
+          broadcast_stamp: this.state.broadcastStamp,
+        }],
       ]);
-
-      const notification = this.state.notifications.find(
-        (n) => n.id === notificationId
-      );
-      if (notification) {
-        notification.state = "read";
-      }
-
-      this.state.unreadNotifications = this.state.notifications.filter(
-        (n) => n.state === "unread"
-      );
-
-      this.fetchUnreadCount();
+      await this._applyChanges(results[1]);
     } catch (error) {
       console.error("Error marking notification as read:", error);
     }
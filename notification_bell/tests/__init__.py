@@ -0,0 +1,6 @@
+from . import test_bulk_send
+from . import test_indexes
+from . import test_snapshot
+from . import test_queue
+from . import test_rate_limit
+from . import test_benchmark
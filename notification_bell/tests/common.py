@@ -0,0 +1,45 @@
+"""Shared fixtures of the notification_bell tests."""
+
+from odoo.tests import TransactionCase
+
+
+class NotificationBellCase(TransactionCase):
+    """Base class creating bell users in bulk."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True, no_reset_password=True))
+        cls.Notification = cls.env['user.notification']
+        cls.Counter = cls.env['user.notification.counter']
+
+    @classmethod
+    def _create_users(cls, count, prefix='bell'):
+        """Create internal users of the bell in a single ``create`` call.
+
+        Args:
+            count (int): Number of users to create
+            prefix (str, optional): Prefix of their logins
+
+        Returns:
+            res.users: Created users
+        """
+        group = cls.env.ref('notification_bell.group_notification_user')
+        return cls.env['res.users'].create([{
+            'name': f'{prefix.title()} User {index}',
+            'login': f'{prefix}_user_{index}',
+            'email': f'{prefix}_user_{index}@example.com',
+            'groups_id': [(6, 0, group.ids)],
+        } for index in range(count)])
+
+    def _count_queries(self, function, *args, **kwargs):
+        """Run a function and count the queries it sent.
+
+        Returns:
+            tuple: Result of the function and number of queries
+        """
+        self.env.flush_all()
+        start = self.env.cr.sql_log_count
+        result = function(*args, **kwargs)
+        self.env.flush_all()
+        return result, self.env.cr.sql_log_count - start
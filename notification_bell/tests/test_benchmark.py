@@ -0,0 +1,202 @@
+"""Benchmark of the bell's hot paths.
+
+Not part of the standard test run. Run it with::
+
+    odoo-bin -d <db> -u notification_bell --test-enable --stop-after-init \
+        --test-tags notification_bell_benchmark
+
+The volume of seeded notifications is set by the
+``NOTIFICATION_BELL_BENCHMARK_ROWS`` environment variable (10k by default,
+e.g. 1000000 or 10000000 for the larger runs) and the number of users by
+``NOTIFICATION_BELL_BENCHMARK_USERS`` (200 by default). Every measure is
+logged with its duration, query count and bus messages, and query counts
+are asserted so that a regression of the hot paths fails the run.
+"""
+
+import logging
+import os
+import time
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import NotificationBellCase
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_ROWS = int(os.environ.get('NOTIFICATION_BELL_BENCHMARK_ROWS', 10000))
+BENCHMARK_USERS = int(os.environ.get('NOTIFICATION_BELL_BENCHMARK_USERS', 200))
+
+
+class LocalBus:
+    """Stand-in for ``bus.bus`` recording the messages instead of sending them."""
+
+    def __init__(self):
+        self.messages = []
+
+    def patch(self, model):
+        """Route the bus messages of a model class to this stand-in.
+
+        Args:
+            model (type): Registry class of ``user.notification``
+
+        Returns:
+            unittest.mock._patch: Patcher to start
+        """
+        bus = self
+
+        def _send_bus_message(self, channel, message_type, payload):
+            bus.messages.append((channel, message_type, payload))
+
+        return patch.object(model, '_send_bus_message', _send_bus_message)
+
+
+@tagged('notification_bell_benchmark', '-standard', 'post_install', '-at_install')
+class TestBenchmark(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bus = LocalBus()
+        cls.startClassPatcher(cls.bus.patch(type(cls.Notification)))
+        cls.users = cls._create_users(BENCHMARK_USERS, prefix='benchmark')
+        cls.user = cls.users[0]
+        cls._seed(BENCHMARK_ROWS)
+
+    @classmethod
+    def _seed(cls, rows):
+        """Insert ``rows`` notifications spread over the benchmark users.
+
+        A quarter of them are unread and a tenth dismissed. Rows are
+        inserted by chunks of a million with ``generate_series``, then the
+        counters are recomputed and the table analyzed.
+        """
+        start = time.perf_counter()
+        for offset in range(0, rows, 1000000):
+            cls.env.cr.execute("""
+                INSERT INTO user_notification
+                            (user_id, sender_id, company_id, name, message, notification_type,
+                             state, active, action_type, occurrence_count, sync_version,
+                             create_uid, create_date, write_uid, write_date)
+                     SELECT (%(user_ids)s)[1 + serial %% %(users)s], %(sender_id)s, %(company_id)s,
+                            'Seeded ' || serial, 'Seeded notification', 'info',
+                            CASE WHEN serial %% 4 = 0 THEN 'unread' ELSE 'read' END,
+                            serial %% 10 <> 0, 'message', 1, 0,
+                            %(sender_id)s, now() - serial * interval '1 second',
+                            %(sender_id)s, now() - serial * interval '1 second'
+                       FROM generate_series(%(first)s, %(last)s) AS serial
+            """, {
+                'user_ids': cls.users.ids,
+                'users': len(cls.users),
+                'sender_id': cls.env.uid,
+                'company_id': cls.env.company.id,
+                'first': offset + 1,
+                'last': min(offset + 1000000, rows),
+            })
+        cls.Counter._recompute_counters(cls.users.ids)
+        cls.env.cr.execute('ANALYZE user_notification')
+        _logger.info("Seeded %s notifications for %s users in %.2fs",
+                     rows, len(cls.users), time.perf_counter() - start)
+
+    def _measure(self, label, max_queries, function, *args, count=1, **kwargs):
+        """Run a function, check its query count and log its cost.
+
+        The bus messages queued by the function are flushed to the stand-in
+        bus as they would be at commit, and count in the measure.
+
+        Args:
+            label (str): Name of the measured path
+            max_queries (int): Maximum number of queries of the path
+            function (callable): Function to measure
+            count (int, optional): Number of notifications handled, to
+                report a throughput
+
+        Returns:
+            Result of the function
+        """
+        self.bus.messages.clear()
+        start = time.perf_counter()
+        with self.assertQueryCount(max_queries):
+            result = function(*args, **kwargs)
+            self.env.flush_all()
+            self.env.cr.precommit.run()
+        duration = time.perf_counter() - start
+        _logger.info(
+            "Benchmark %s (%s rows): %.2fms, %.0f/s, %s bus messages",
+            label, BENCHMARK_ROWS, duration * 1000, count / duration if duration else 0,
+            len(self.bus.messages),
+        )
+        return result
+
+    def _warm_up(self, function, *args, **kwargs):
+        """Fill the caches used by a path before measuring it."""
+        function(*args, **kwargs)
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+
+    def test_send_single(self):
+        Notification = self.Notification.sudo()
+        self._warm_up(Notification.send_notification, self.user.id, "Warm up", "Warm up")
+        self._measure(
+            'send_notification', 25,
+            Notification.send_notification, self.user.id, "Single", "Single notification")
+        self.assertEqual(len(self.bus.messages), 1)
+        self.assertEqual(self.bus.messages[0][1], 'new_notification')
+
+    def test_send_bulk(self):
+        Notification = self.Notification.sudo()
+        self._warm_up(Notification.send_notification_bulk, self.user.ids, "Warm up", "Warm up")
+        records = self._measure(
+            'send_notification_bulk', 25,
+            Notification.send_notification_bulk, self.users.ids, "Bulk", "Bulk notification",
+            count=len(self.users))
+        self.assertEqual(len(records), len(self.users))
+        self.assertEqual(len(self.bus.messages), len(self.users), "One bus message per recipient")
+
+    def test_snapshot(self):
+        Notification = self.Notification.with_user(self.user)
+        self._warm_up(Notification.get_bell_snapshot)
+        snapshot = self._measure('get_bell_snapshot', 4, Notification.get_bell_snapshot)
+        self.assertTrue(snapshot['notifications'])
+        self._measure(
+            'get_bell_snapshot (not modified)', 2,
+            Notification.get_bell_snapshot, etag=snapshot['etag'])
+
+    def test_unread_count(self):
+        Notification = self.Notification.with_user(self.user)
+        route = '/notification_bell/get_unread_count'
+        self._warm_up(Notification.json_rpc, route)
+        result = self._measure('get_unread_count', 4, Notification.json_rpc, route)
+        self.assertGreater(result['unread_count'], 0)
+        result = self._measure(
+            'get_unread_count (not modified)', 2, Notification.json_rpc, route, {'etag': result['etag']})
+        self.assertTrue(result['not_modified'])
+
+    def test_sync(self):
+        Notification = self.Notification.with_user(self.user)
+        version = Notification.get_bell_snapshot()['version']
+        Notification.sudo().send_notification(self.user.id, "Sync", "Sync notification")
+        self.env.flush_all()
+        self._warm_up(Notification.get_changes, version)
+        changes = self._measure('get_changes', 5, Notification.get_changes, version)
+        self.assertEqual(len(changes['notifications']), 1)
+
+    def test_mark_all_read(self):
+        Notification = self.Notification.with_user(self.user)
+        unread = self.Counter._get_unread_count(self.user.id)
+        self._measure(
+            'mark_all_read', 10,
+            Notification.json_rpc, '/notification_bell/mark_as_read', {'all_notifications': True},
+            count=unread)
+        self.assertEqual(self.Counter._get_unread_count(self.user.id), 0)
+        self.assertEqual([message[1] for message in self.bus.messages], ['notification_state'])
+
+    def test_dismiss(self):
+        Notification = self.Notification.with_user(self.user)
+        notification_id = Notification.get_bell_snapshot(limit=1)['notifications'][0]['id']
+        result = self._measure(
+            'dismiss_notification', 10,
+            Notification.json_rpc, '/notification_bell/dismiss_notification',
+            {'notification_id': notification_id})
+        self.assertTrue(result['success'])
+        self.assertEqual([message[1] for message in self.bus.messages], ['notification_state'])
@@ -0,0 +1,47 @@
+"""Tests of the bulk fan-out API."""
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import NotificationBellCase
+
+
+@tagged('post_install', '-at_install')
+class TestBulkSend(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = cls._create_users(120, prefix='bulk')
+
+    def test_bulk_insert_rows_and_counters(self):
+        """Every recipient gets one unread row and an unread count of one."""
+        Notification = self.Notification.sudo()
+        with patch.object(type(Notification), '_bulk_batch_size', 50):
+            records = Notification.send_notification_bulk(
+                self.users.ids + self.users[:10].ids, "Maintenance", "Tonight at 22:00")
+
+        self.assertEqual(len(records), len(self.users), "Duplicate recipients must be skipped")
+        self.assertEqual(
+            Notification.search_count([('user_id', 'in', self.users.ids)]), len(self.users))
+        self.assertEqual(
+            Notification.search_count([('user_id', 'in', self.users.ids), ('state', '=', 'unread')]),
+            len(self.users))
+        self.assertEqual(set(records.mapped('user_id').ids), set(self.users.ids))
+        for user in self.users:
+            self.assertEqual(self.Counter._get_unread_count(user.id), 1)
+
+    def test_bulk_insert_query_count_is_bounded(self):
+        """The number of queries depends on the batches, not on the recipients."""
+        Notification = self.Notification.sudo()
+        # Warm the caches.
+        Notification.send_notification_bulk(self.users[:1].ids, "Warm up", "Warm up")
+
+        _records, few = self._count_queries(
+            Notification.send_notification_bulk, self.users[1:11].ids, "Few", "Few recipients")
+        _records, many = self._count_queries(
+            Notification.send_notification_bulk, self.users[11:].ids, "Many", "Many recipients")
+
+        self.assertEqual(many, few, "Sending to more users in one batch must not add queries")
+        self.assertLessEqual(many, 20)
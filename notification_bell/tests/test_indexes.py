@@ -0,0 +1,102 @@
+"""Tests that the bell's hot queries are served by the module's indexes."""
+
+import re
+from unittest.mock import patch
+
+from odoo.sql_db import Cursor
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from .common import NotificationBellCase
+
+
+@tagged('post_install', '-at_install')
+class TestIndexes(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = cls._create_users(5, prefix='index')
+        cls.user = cls.users[0]
+        cls.env.cr.execute("""
+            INSERT INTO user_notification
+                        (user_id, sender_id, company_id, name, message, notification_type,
+                         state, active, action_type, occurrence_count, sync_version,
+                         create_uid, create_date, write_uid, write_date)
+                 SELECT (%(user_ids)s)[1 + serial %% %(users)s], %(sender_id)s, %(company_id)s,
+                        'Seeded ' || serial, 'Seeded notification', 'info',
+                        CASE WHEN serial %% 4 = 0 THEN 'unread' ELSE 'read' END,
+                        serial %% 10 <> 0, 'message', 1, serial,
+                        %(sender_id)s, now() - serial * interval '1 minute',
+                        %(sender_id)s, now() - serial * interval '1 minute'
+                   FROM generate_series(1, 20000) AS serial
+        """, {
+            'user_ids': cls.users.ids,
+            'users': len(cls.users),
+            'sender_id': cls.env.uid,
+            'company_id': cls.env.company.id,
+        })
+        cls.Counter._recompute_counters(cls.users.ids)
+        cls.env.cr.execute('ANALYZE user_notification')
+        cls.env.cr.execute('ANALYZE user_notification_counter')
+
+    def _explain(self, query, params=None):
+        """Return the plan of a query as the planner would choose it on a big table.
+
+        Sequential scans are disabled, as they would be too expensive with
+        millions of rows, so the plan shows which index serves the query;
+        a query without a usable index still falls back to a sequential scan.
+        """
+        if isinstance(query, SQL):
+            query, params = query.code, query.params
+        self.env.cr.execute('SET LOCAL enable_seqscan = off')
+        try:
+            self.env.cr.execute(f'EXPLAIN {query}', params)
+            return '\n'.join(row[0] for row in self.env.cr.fetchall())
+        finally:
+            self.env.cr.execute('SET LOCAL enable_seqscan = on')
+
+    def test_notification_page_uses_index(self):
+        """A page of the bell walks the (user_id, active, create_date, id) index."""
+        Notification = self.Notification.with_user(self.user)
+        query = Notification._search(
+            [('user_id', '=', self.user.id)], limit=10, order='create_date desc, id desc')
+        plan = self._explain(query.select('id'))
+        self.assertNotIn('Seq Scan on user_notification', plan)
+        self.assertIn('user_notification_user_active_date_idx', plan)
+
+    def test_unread_count_uses_counter_index(self):
+        """The unread count is read from the counter row of the user, through its unique index."""
+        plan = self._explain(SQL(
+            'SELECT unread_count, version FROM user_notification_counter WHERE user_id = %s',
+            self.user.id,
+        ))
+        self.assertNotIn('Seq Scan on user_notification_counter', plan)
+        self.assertIn('user_notification_counter_user_uniq', plan)
+
+    def test_snapshot_queries_use_indexes(self):
+        """Every query the bell snapshot sends to the notification tables is served by an index."""
+        queries = []
+        execute = Cursor.execute
+
+        def record(cr, query, params=None, log_exceptions=True):
+            if isinstance(query, SQL):
+                query, params = query.code, query.params
+            queries.append((query, params))
+            return execute(cr, query, params, log_exceptions)
+
+        Notification = self.Notification.with_user(self.user)
+        self.env.flush_all()
+        with patch.object(Cursor, 'execute', record):
+            Notification.get_bell_snapshot()
+
+        table = re.compile(r'\buser_notification(_counter)?\b')
+        scan = re.compile(r'Seq Scan on user_notification(_counter)?\b')
+        explained = 0
+        for query, params in queries:
+            if not query.lstrip().upper().startswith(('SELECT', 'WITH')) or not table.search(query):
+                continue
+            plan = self._explain(query, params)
+            self.assertFalse(scan.search(plan), f"Sequential scan in the plan of:\n{query}\n{plan}")
+            explained += 1
+        self.assertGreaterEqual(explained, 2, "The page and the counter lookup are explained")
@@ -0,0 +1,35 @@
+"""Tests of the asynchronous delivery queue."""
+
+from odoo.exceptions import AccessError
+from odoo.tests import tagged
+
+from .common import NotificationBellCase
+
+
+@tagged('post_install', '-at_install')
+class TestQueue(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Queue = cls.env['user.notification.queue']
+        cls.user, cls.other_user = cls._create_users(2, prefix='queue')
+
+    def test_enqueue_for_another_user_is_denied(self):
+        """The record rules of the notifications apply when they are queued."""
+        Notification = self.Notification.with_user(self.user)
+        queued = self.Queue.search_count([])
+        with self.assertRaises(AccessError):
+            Notification.send_notification(self.other_user.id, "Queued", "For someone else", enqueue=True)
+        self.assertEqual(self.Queue.search_count([]), queued)
+
+    def test_enqueue_for_oneself_is_delivered(self):
+        """Queued notifications are created by the drainer with the caller's defaults."""
+        Notification = self.Notification.with_user(self.user)
+        Notification.send_notification(self.user.id, "Queued", "For myself", enqueue=True)
+        self.Queue._cron_drain()
+
+        notification = self.Notification.search([('user_id', '=', self.user.id)])
+        self.assertEqual(notification.name, "Queued")
+        self.assertEqual(notification.sender_id, self.user)
+        self.assertFalse(self.Queue.search_count([('state', '=', 'pending')]))
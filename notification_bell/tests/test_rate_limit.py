@@ -0,0 +1,61 @@
+"""Tests of the per-recipient and per-sender rate limits."""
+
+from odoo.exceptions import AccessError
+from odoo.tests import tagged
+
+from .common import NotificationBellCase
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimit(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user, cls.other_user = cls._create_users(2, prefix='rate')
+        cls.env['ir.config_parameter'].set_param('notification_bell.recipient_rate_limit', 1)
+
+    def _summaries(self, user):
+        return self.Notification.search([
+            ('user_id', '=', user.id),
+            ('collapse_key', '=', 'notification_bell.rate_limited'),
+        ])
+
+    def test_summary_adds_up_held_notifications(self):
+        """The summary of a recipient counts every notification held back."""
+        Notification = self.Notification.sudo()
+        for index in range(3):
+            Notification.send_notification(self.user.id, f"First {index}", "First burst")
+        summary = self._summaries(self.user)
+        self.assertEqual(summary.occurrence_count, 2)
+        self.assertIn("2 notifications", summary.message)
+
+        for index in range(2):
+            Notification.send_notification(self.user.id, f"Second {index}", "Second burst")
+        summary = self._summaries(self.user)
+        self.assertEqual(len(summary), 1, "Held notifications are merged into a single summary")
+        self.assertEqual(summary.occurrence_count, 4)
+        self.assertIn("4 notifications", summary.message)
+
+    def test_deferred_notifications_check_record_rules(self):
+        """Notifications over the limits cannot bypass the record rules through the queue."""
+        self.env['ir.config_parameter'].set_param('notification_bell.rate_limit_policy', 'defer')
+        Notification = self.Notification.with_user(self.user)
+        Queue = self.env['user.notification.queue']
+        queued = Queue.search_count([])
+        with self.assertRaises(AccessError):
+            Notification.create([
+                {'user_id': self.other_user.id, 'name': f"Deferred {index}", 'message': "For someone else"}
+                for index in range(3)
+            ])
+        self.assertEqual(Queue.search_count([]), queued)
+
+    def test_tokens_are_given_back_on_rollback(self):
+        """Buckets are changed in the sender's transaction."""
+        Bucket = self.env['user.notification.rate.bucket']
+        key = f'recipient:{self.other_user.id}'
+        with self.env.cr.savepoint() as savepoint:
+            self.assertEqual(Bucket._consume({key: (1, 1, 0)}), {key: 1})
+            self.assertEqual(Bucket._consume({key: (1, 1, 0)}), {key: 0})
+            savepoint.rollback()
+        self.assertEqual(Bucket._consume({key: (1, 1, 0)}), {key: 1})
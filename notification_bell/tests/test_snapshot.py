@@ -0,0 +1,39 @@
+"""Tests of the bell snapshot API."""
+
+from odoo.tests import tagged
+
+from .common import NotificationBellCase
+
+
+@tagged('post_install', '-at_install')
+class TestSnapshot(NotificationBellCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = cls._create_users(1, prefix='snapshot')
+        Notification = cls.Notification.sudo()
+        for index in range(30):
+            Notification.send_notification_bulk(cls.user.ids, f"Notification {index}", "Snapshot test")
+
+    def test_snapshot_content(self):
+        snapshot = self.Notification.with_user(self.user).get_bell_snapshot(limit=10)
+        self.assertEqual(len(snapshot['notifications']), 10)
+        self.assertEqual(snapshot['unread_count'], 30)
+        self.assertTrue(snapshot['next_cursor'])
+        self.assertEqual(snapshot['settings']['notifications_limit'], 10)
+        self.assertTrue(all(row['sender_name'] for row in snapshot['notifications']))
+
+    def test_snapshot_query_count(self):
+        """On warm caches, the snapshot costs a fixed, small number of queries."""
+        Notification = self.Notification.with_user(self.user)
+        Notification.get_bell_snapshot()
+        with self.assertQueryCount(4):
+            Notification.get_bell_snapshot()
+
+    def test_json_rpc_query_count(self):
+        """Going through json_rpc adds no query to the snapshot."""
+        Notification = self.Notification.with_user(self.user)
+        Notification.json_rpc('/notification_bell/get_notifications', {})
+        with self.assertQueryCount(4):
+            Notification.json_rpc('/notification_bell/get_notifications', {})
@@ -0,0 +1,7 @@
+"""Notification Bell Tools.
+
+This package contains helpers shared by the models and controllers of
+the notification_bell module.
+"""
+
+from . import metrics
@@ -0,0 +1,155 @@
+"""Per-worker metrics of the notification bell.
+
+Counters and latency histograms are kept in the memory of each worker
+process and exposed in the Prometheus text format by the
+``/notification_bell/metrics`` route. Recording a value only takes a
+lock and a few dictionary updates, no query.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    'notification_bell_requests_total': ('counter', 'Calls of the notification routes'),
+    'notification_bell_request_duration_seconds': ('histogram', 'Duration of the notification routes'),
+    'notification_bell_request_queries_total': ('counter', 'SQL queries run by the notification routes'),
+    'notification_bell_rows_returned_total': ('counter', 'Notifications returned by the notification routes'),
+    'notification_bell_sends_total': ('counter', 'Calls of the send helpers'),
+    'notification_bell_send_duration_seconds': ('histogram', 'Duration of the send helpers'),
+    'notification_bell_send_queries_total': ('counter', 'SQL queries run by the send helpers'),
+    'notification_bell_notifications_sent_total': ('counter', 'Notifications created by the send helpers'),
+    'notification_bell_bus_messages_total': ('counter', 'Bus messages sent'),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Increase a counter.
+
+    Args:
+        name (str): Name of the metric
+        value (float, optional): Amount to add
+        **labels: Labels of the series
+    """
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    """Record a value in a histogram.
+
+    Args:
+        name (str): Name of the metric
+        value (float): Observed value
+        **labels: Labels of the series
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+@contextmanager
+def _measure(calls, duration, queries, cr, **labels):
+    """Measure the duration and the number of queries of a block.
+
+    Args:
+        calls (str): Name of the counter of calls
+        duration (str): Name of the duration histogram
+        queries (str): Name of the counter of queries
+        cr (Cursor): Cursor whose ``sql_log_count`` counts the queries it
+            executed
+        **labels: Labels of the series
+    """
+    count = getattr(cr, 'sql_log_count', 0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(duration, time.perf_counter() - start, **labels)
+        inc(calls, **labels)
+        inc(queries, getattr(cr, 'sql_log_count', 0) - count, **labels)
+
+
+def timed(route, cr):
+    """Measure the duration and the number of queries of a route.
+
+    Args:
+        route (str): Route name, used as label
+        cr (Cursor): Cursor of the request
+    """
+    return _measure(
+        'notification_bell_requests_total', 'notification_bell_request_duration_seconds',
+        'notification_bell_request_queries_total', cr, route=route,
+    )
+
+
+def timed_send(mode, cr):
+    """Measure the duration and the number of queries of a send helper.
+
+    Sends have their own series so that they do not skew the latency of
+    the routes, which they are usually called outside of.
+
+    Args:
+        mode (str): ``single`` or ``bulk``, used as label
+        cr (Cursor): Cursor of the sender's transaction
+    """
+    return _measure(
+        'notification_bell_sends_total', 'notification_bell_send_duration_seconds',
+        'notification_bell_send_queries_total', cr, mode=mode,
+    )
+
+
+def _format_labels(labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('"', '\\"')) for name, value in labels)
+
+
+def render():
+    """Render the metrics of this worker in the Prometheus text format.
+
+    Every series carries a ``worker`` label with the process ID, since each
+    worker only knows its own values.
+
+    Returns:
+        str: Metrics in the Prometheus text exposition format
+    """
+    worker = (('worker', str(os.getpid())),)
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+    series = defaultdict(list)
+    for (name, labels), value in counters.items():
+        series[name].append('%s%s %s' % (name, _format_labels(labels + worker), value))
+    for (name, labels), histogram in histograms.items():
+        for bound, count in zip(LATENCY_BUCKETS, histogram):
+            series[name].append('%s_bucket%s %s' % (
+                name, _format_labels(labels + worker + (('le', bound),)), count))
+        series[name].append('%s_bucket%s %s' % (
+            name, _format_labels(labels + worker + (('le', '+Inf'),)), histogram[-1]))
+        series[name].append('%s_sum%s %s' % (name, _format_labels(labels + worker), histogram[-2]))
+        series[name].append('%s_count%s %s' % (name, _format_labels(labels + worker), histogram[-1]))
+    lines = []
+    for name in sorted(series):
+        metric_type, description = _HELP.get(name, ('untyped', name))
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        lines.extend(series[name])
+    return '\n'.join(lines) + '\n'